@@ -98,6 +98,27 @@ DATABASES = {
     }
 }
 
+# 缓存
+# "feed" 用于社区文章列表的整页缓存（main/feed_cache.py）。
+# 本地内存缓存只在当前进程内有效，多进程部署时可换成文件缓存，让失效版本号在进程间共享：
+#     'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#     'LOCATION': BASE_DIR / 'cache' / 'feed',
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'feed': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'feed',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+# 列表页缓存有效期（秒）
+FEED_CACHE_TIMEOUT = 300
+# 导航数据（分类、标签）版本号所在的缓存，以及进程内快照的最长有效期（秒）
+NAV_CACHE_ALIAS = 'default'
+NAV_MAX_AGE = 600
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -180,7 +201,28 @@ HAYSTACK_CONNECTIONS = {
      'default': {
      'ENGINE':'main.whoosh_cn_backend.WhooshEngine',
      'PATH': BASE_DIR / 'whoosh_index',
+     # 进程内缓存的查询结果条数（LRU），索引提交后自动失效；0 表示关闭
+     'RESULT_CACHE_SIZE': 256,
+     # 进程内缓存的高亮摘要条数（LRU），按文档和查询词缓存；0 表示关闭
+     'SNIPPET_CACHE_SIZE': 2048,
     }
 }
 HAYSTACK_SEARCH_RESULTS_PER_PAGE= 10
-HAYSTACK_SIGNAL_PROCESSOR ='haystack.signals.RealtimeSignalProcessor'
\ No newline at end of file
+# 索引段合并（`python manage.py merge_search_segments`）：段数超过阈值且处于低峰时段时合并成一个段
+WHOOSH_MERGE_THRESHOLD = 10
+WHOOSH_MERGE_WINDOW = '02:00-05:00'
+WHOOSH_MERGE_STATS_FILE = BASE_DIR / 'cache' / 'whoosh_merge_stats.json'
+# jieba 分词：启动时预加载词典（main/jieba_loader.py）。前缀词典缓存文件各进程共用；
+# 自定义词典由 `python manage.py build_jieba_userdict` 根据疫苗、里程碑、分类、标签生成
+JIEBA_WARMUP = True
+JIEBA_CACHE_FILE = BASE_DIR / 'cache' / 'jieba.cache'
+JIEBA_USERDICT = BASE_DIR / 'cache' / 'jieba_userdict.txt'
+# 照片各尺寸版本（main/renditions.py）：按需生成，按总字节数淘汰最久未用的文件，
+# 也可用 `python manage.py prune_renditions` 定时清理
+RENDITION_CACHE_DIR = BASE_DIR / 'cache' / 'renditions'
+RENDITION_CACHE_MAX_BYTES = 2 * 1024 ** 3
+# 照片解码（main/image_io.py）：超过该像素数的图片视为解压炸弹直接拒绝；每个进程同时解码占用的内存上限
+IMAGE_MAX_PIXELS = 64_000_000
+IMAGE_MEMORY_BUDGET = 256 * 1024 ** 2
+# 保存/删除时只把变更写入队列表，由 `python manage.py process_search_queue` 在后台批量更新索引
+HAYSTACK_SIGNAL_PROCESSOR = 'main.search_signals.QueuedSignalProcessor'
\ No newline at end of file
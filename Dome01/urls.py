@@ -17,8 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.views.static import serve
+from haystack.query import SearchQuerySet
+from haystack.views import SearchView
 
 from Dome01 import settings
+from main.models import Articles
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -31,5 +34,6 @@ urlpatterns = [
 
     path('captcha/', include('captcha.urls')),
 
-    path('search/', include('haystack.urls')),
+    # 公开搜索只查社区文章；家庭私有记录走 main:family_search，按家庭成员关系过滤
+    path('search/', SearchView(searchqueryset=SearchQuerySet().models(Articles).highlight()), name='haystack_search'),
 ]
@@ -1,7 +1,8 @@
 from django.contrib import admin
 
 from main.models import Record, BabyParent, Category, Articles, Tag, Photo, Measurement, Vaccine, VaccineRecord, \
-    MilestoneType, Event, CheckupRecord, MedicationRecord
+    MilestoneType, Event, CheckupRecord, MedicationRecord, SearchIndexQueue, RelatedArticle, \
+    MediaBlob
 
 
 # Register your models here.
@@ -16,7 +17,9 @@ class RecordAdmin(admin.ModelAdmin):
 
 @admin.register(Photo)
 class PhotoAdmin(admin.ModelAdmin):
-    pass
+    list_display = ('id', 'baby', 'media_type', 'thumbnail_status', 'thumbnail_attempts', 'uploaded_at')
+    list_filter = ('media_type', 'thumbnail_status')
+    readonly_fields = ('thumbnail_status', 'thumbnail_attempts', 'thumbnail_error', 'thumbnail_due_at')
 
 @admin.register(Measurement)
 class MeasurementAdmin(admin.ModelAdmin):
@@ -75,4 +78,20 @@ class TagAdmin(admin.ModelAdmin):
 class ArticleAdmin(admin.ModelAdmin):
     pass
 
+@admin.register(SearchIndexQueue)
+class SearchIndexQueueAdmin(admin.ModelAdmin):
+    list_display = ('model_label', 'object_id', 'action', 'queued_at')
+    list_filter = ('model_label', 'action')
+
+
+@admin.register(RelatedArticle)
+class RelatedArticleAdmin(admin.ModelAdmin):
+    list_display = ('article', 'rank', 'related', 'score', 'computed_at')
+    raw_id_fields = ('article', 'related')
+
 
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ('digest', 'ref_count', 'size', 'created_at', 'released_at')
+    list_filter = ('ref_count',)
+    readonly_fields = ('digest', 'name', 'size', 'ref_count', 'created_at', 'released_at')
@@ -7,4 +7,10 @@ class MainConfig(AppConfig):
 
     # 注册信号：Django启动时加载signals.py
     def ready(self):
-        import main.signals  # 导入你的signals.py（路径：app名.signals）
\ No newline at end of file
+        import main.signals  # 导入你的signals.py（路径：app名.signals）
+
+        # 启动时预加载 jieba 词典，避免每个进程的第一次搜索/保存卡顿
+        from django.conf import settings
+        if getattr(settings, "JIEBA_WARMUP", True):
+            from main.jieba_loader import warm_up
+            warm_up()
\ No newline at end of file
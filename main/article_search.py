@@ -0,0 +1,89 @@
+"""
+社区文章全文检索
+
+关键词检索全部走 Whoosh 索引（jieba ChineseAnalyzer 分词），不再对富文本做 LIKE 全表扫描。
+检索范围是正文主字段（标题+正文+标签+分类）以及单独加权的标题、标签、分类字段，
+由 Whoosh 的 BM25F 打分自然让标题、标签命中的文章排在前面。
+
+有关键词时，分类、标签、月份筛选和检索一起在索引中完成（category_ids / tag_ids / month 关键字字段），
+命中的ID最多 MAX_SEARCH_RESULTS 条；没有关键词的纯筛选直接在数据库中完成（filter_articles），
+不受该上限影响，列表的游标分页也保持每页代价相同，新发表的文章不必等索引队列处理完就能筛到。
+分面计数由搜索后端的结果缓存保存（键里带索引代数，索引有新提交后自动重新统计）。
+"""
+from datetime import datetime
+
+from django.utils import timezone
+from haystack.inputs import AutoQuery, Exact
+from haystack.query import SQ, SearchQuerySet
+
+from main.category_tree import get_category_tree
+from main.models import Articles
+
+# 参与关键词检索的索引字段，权重在 search_indexes.ArticlesIndex 中定义
+SEARCH_FIELDS = ("content", "title", "tags", "categories")
+# 一次检索最多取回的文章数，列表页在这个范围内按时间分页
+MAX_SEARCH_RESULTS = 1000
+# 分面字段 -> 筛选参数名
+FACET_FIELDS = {
+    "category_ids": "category",
+    "tag_ids": "tag",
+    "month": "month",
+}
+
+
+def article_search_queryset(query=None, category=None, tag=None, month=None):
+    """关键词检索加分类/标签/月份筛选的 SearchQuerySet；有关键词时按相关度排序，否则按发表时间倒序"""
+    sqs = SearchQuerySet().models(Articles)
+    if query:
+        condition = SQ()
+        for field in SEARCH_FIELDS:
+            condition |= SQ(**{field: AutoQuery(query)})
+        sqs = sqs.filter(condition)
+    else:
+        sqs = sqs.order_by("-created")
+    # 分类ID已包含上级分类，筛选父分类时自动包含子分类的文章
+    for field, value in (("category_ids", category), ("tag_ids", tag), ("month", month)):
+        if value:
+            sqs = sqs.filter(**{field: Exact(str(value))})
+    return sqs
+
+
+def search_article_ids(query=None, limit=MAX_SEARCH_RESULTS, **filters):
+    """匹配关键词和筛选条件的文章ID列表"""
+    return [int(pk) for pk in article_search_queryset(query, **filters).values_list("pk", flat=True)[:limit]]
+
+
+def filter_articles(queryset, category=None, tag=None, month=None):
+    """
+    不带关键词时的分类/标签/月份筛选，与索引中的筛选含义一致：父分类包含子分类的文章，月份按当前时区。
+    多对多条件用子查询，不连表，结果不会重复，不需要 distinct。
+    """
+    if category:
+        category_ids = get_category_tree().descendant_ids(int(category))
+        queryset = queryset.filter(
+            pk__in=Articles.categorys.through.objects.filter(category_id__in=category_ids).values("articles_id")
+        )
+    if tag:
+        queryset = queryset.filter(pk__in=Articles.tags.through.objects.filter(tag_id=tag).values("articles_id"))
+    if month:
+        # 用时间范围而不是 __year/__month，可以走 created_articles 索引
+        year, number = map(int, month.split("-"))
+        start = timezone.make_aware(datetime(year, number, 1))
+        end = timezone.make_aware(datetime(year + number // 12, number % 12 + 1, 1))
+        queryset = queryset.filter(created_articles__gte=start, created_articles__lt=end)
+    return queryset
+
+
+def facet_counts(query=None):
+    """
+    当前关键词下各分类、标签、月份的文章数，形如 {"category": {"3": 12}, "tag": {...}, "month": {"2025-10": 5}}。
+    只按关键词统计、不受已选筛选条件影响，切换筛选时各项计数保持不变。
+    """
+    sqs = article_search_queryset(query)
+    for field in FACET_FIELDS:
+        sqs = sqs.facet(field)
+    fields = sqs.facet_counts().get("fields", {})
+    return {
+        param: {value: count for value, count in fields.get(field, []) if value is not None}
+        for field, param in FACET_FIELDS.items()
+    }
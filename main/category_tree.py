@@ -0,0 +1,80 @@
+"""
+分类树
+
+一次查询取出全部分类，在内存中建立父子关系；查询父类、子类、全部后代都不再访问数据库。
+每个节点的后代ID集合（含自身）第一次计算后缓存，用于 categorys__in 过滤，
+让筛选父分类时自动包含所有子分类的文章。
+
+树本身随导航数据一起按版本号缓存在进程内（见 navigation.py），分类变化后自动重建。
+"""
+
+
+class CategoryTree:
+    def __init__(self, categories):
+        # 按ID排序，保证同级分类顺序稳定
+        self.categories = sorted(categories, key=lambda c: c.id)
+        self.by_id = {c.id: c for c in self.categories}
+        self._children = {c.id: [] for c in self.categories}
+        self.roots = []
+        for c in self.categories:
+            # 父分类不存在时按顶级分类处理
+            if c.classification_parent_id in self.by_id:
+                self._children[c.classification_parent_id].append(c)
+            else:
+                self.roots.append(c)
+        # 模板里直接遍历 child_list 渲染多级菜单
+        for c in self.categories:
+            c.child_list = self._children[c.id]
+        self._descendant_ids = {}
+
+    def get(self, category_id):
+        return self.by_id.get(category_id)
+
+    def parent(self, category_id):
+        node = self.by_id.get(category_id)
+        if node is None:
+            return None
+        return self.by_id.get(node.classification_parent_id)
+
+    def children(self, category_id):
+        return list(self._children.get(category_id, ()))
+
+    def ancestors(self, category_id):
+        """从直接父类到顶级分类的列表"""
+        result = []
+        seen = {category_id}
+        node = self.parent(category_id)
+        while node is not None and node.id not in seen:
+            result.append(node)
+            seen.add(node.id)
+            node = self.parent(node.id)
+        return result
+
+    def descendant_ids(self, category_id):
+        """包含自身在内的全部后代ID，结果缓存"""
+        cached = self._descendant_ids.get(category_id)
+        if cached is not None:
+            return cached
+        if category_id not in self.by_id:
+            return frozenset()
+        ids = set()
+        stack = [category_id]
+        # 迭代遍历，遇到数据中的环也不会死循环
+        while stack:
+            current = stack.pop()
+            if current in ids:
+                continue
+            ids.add(current)
+            stack.extend(c.id for c in self._children.get(current, ()))
+        result = self._descendant_ids[category_id] = frozenset(ids)
+        return result
+
+    def descendants(self, category_id):
+        """全部后代分类（不含自身）"""
+        return [self.by_id[i] for i in sorted(self.descendant_ids(category_id)) if i != category_id]
+
+
+def get_category_tree():
+    """当前进程缓存的分类树"""
+    from main.navigation import get_navigation
+    return get_navigation().category_tree
@@ -0,0 +1,112 @@
+"""
+文章评论树
+
+一条查询取出文章下所有未删除评论（连同评论用户），在内存中按 parent 组装成树，
+顶层评论按游标分页。回复再多，渲染详情页的查询数也是固定的。
+"""
+import base64
+from datetime import datetime
+
+from main.models import ArticleComments
+
+# 评论树最大展示层级
+MAX_DEPTH = 5
+
+
+class CommentPage:
+    """一页顶层评论及其全部回复"""
+
+    def __init__(self, threads, next_cursor, total):
+        # 本页的顶层评论，每条评论的 replies 属性是按时间正序排列的子评论列表
+        self.threads = threads
+        # 下一页的游标，没有更多时为None
+        self.next_cursor = next_cursor
+        # 文章的未删除评论总数（含回复）
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(comment):
+    """把顶层评论的 (评论时间, ID) 编码成不透明的游标"""
+    raw = f"{comment.create_time.isoformat()}|{comment.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """解析游标，格式不对时返回None（当作第一页处理）"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created, pk = raw.split("|", 1)
+        return datetime.fromisoformat(created), int(pk)
+    except (ValueError, UnicodeError):
+        return None
+
+
+def load_comment_tree(article, cursor=None, page_size=20):
+    """
+    加载文章的评论树
+    :param article: 文章对象或文章ID
+    :param cursor: 上一页返回的游标，为空表示第一页
+    :param page_size: 每页顶层评论数
+    :return: CommentPage
+    """
+    # 唯一的一条查询：按时间倒序取出全部评论并连表取出用户
+    comments = list(
+        ArticleComments.objects.filter(article=article, is_deleted=False)
+        .select_related("user")
+        .order_by("-create_time", "-id")
+    )
+
+    by_id = {c.id: c for c in comments}
+    # 按时间正序处理，回复列表自然是时间正序
+    ordered = comments[::-1]
+
+    # 第一遍只建立父子关系。不依赖父评论先于回复出现（时钟回拨、修改过时间的行也能正确组装）；
+    # 父评论不在结果里（已被软删除）的回复提升为顶层，避免丢失
+    children = {}
+    for c in ordered:
+        c.replies = []
+        c.host = None
+        c.depth = None
+        if c.parent_id in by_id:
+            children.setdefault(c.parent_id, []).append(c)
+        else:
+            c.depth = 0
+
+    # 第二遍从顶层往下确定层级：超过 MAX_DEPTH 层的回复挂到同一层，防止回复链过长时模板递归过深
+    stack = [c for c in ordered if c.depth == 0]
+    while stack:
+        node = stack.pop()
+        for child in children.get(node.id, ()):
+            host = node if node.depth < MAX_DEPTH else node.host
+            child.host = host
+            child.depth = host.depth + 1
+            stack.append(child)
+
+    # 第三遍按时间正序挂到各自的上级；从顶层到不了的评论（父子关系成环）当作顶层
+    roots = []
+    for c in ordered:
+        if c.host is not None:
+            c.host.replies.append(c)
+        else:
+            c.depth = 0
+            roots.append(c)
+    # 顶层评论按时间倒序展示
+    roots.reverse()
+
+    start = 0
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None:
+        # roots 按 (时间, ID) 倒序，跳过游标及其之前的评论
+        while start < len(roots) and (roots[start].create_time, roots[start].id) >= position:
+            start += 1
+
+    threads = roots[start:start + page_size]
+    next_cursor = None
+    if start + page_size < len(roots):
+        next_cursor = encode_cursor(threads[-1])
+
+    return CommentPage(threads, next_cursor, len(comments))
@@ -0,0 +1,37 @@
+"""
+家庭私有记录检索
+
+成长记录、里程碑、用药、体检、接种记录各自建立 Whoosh 索引（见 search_indexes.py），
+文档里存有宝宝ID。查询时先从 BabyParent 取出当前用户关联的宝宝，
+作为过滤条件交给索引（不参与打分，可被后端结果缓存复用），不同家庭的数据互相隔离。
+"""
+from haystack.inputs import AutoQuery
+from haystack.query import EmptySearchQuerySet, SearchQuerySet
+from django.urls import reverse
+
+from main.models import BabyParent, CheckupRecord, Event, MedicationRecord, Record, VaccineRecord
+
+FAMILY_MODELS = (Record, Event, MedicationRecord, CheckupRecord, VaccineRecord)
+# 有详情页的记录类型
+DETAIL_URL_NAMES = {
+    "record": "main:record_detail",
+    "event": "main:event_detail",
+    "vaccinerecord": "main:vaccine_record_detail",
+}
+
+
+def family_baby_ids(user):
+    """当前用户作为家庭成员可以查看的宝宝ID"""
+    return list(BabyParent.objects.filter(user=user).values_list("baby_id", flat=True))
+
+
+def family_search_queryset(query, baby_ids):
+    if not query or not baby_ids:
+        return EmptySearchQuerySet()
+    baby_filter = "baby_id:(%s)" % " OR ".join(sorted(baby_id.hex for baby_id in baby_ids))
+    return SearchQuerySet().models(*FAMILY_MODELS).filter(content=AutoQuery(query)).narrow(baby_filter)
+
+
+def result_url(result):
+    url_name = DETAIL_URL_NAMES.get(result.model_name)
+    return reverse(url_name, kwargs={"pk": result.pk}) if url_name else None
@@ -0,0 +1,108 @@
+"""
+社区文章列表的整页缓存
+
+匿名访客看到的 ArticleListView 只取决于 (分类, 标签, 月份, 游标)，把渲染好的页面存进缓存，
+命中时不再查询文章/分类/标签，也不再对富文本跑 strip_tags。
+缓存后端用 settings.CACHES 中的 "feed" 别名配置（本地内存或文件缓存均可）。
+
+失效方式是版本号：缓存键里带当前版本，文章、分类、标签保存或删除时（见 signals.py）
+把版本号+1，旧版本的缓存自然不再被读取，等过期后由后端清理。
+点赞/收藏/评论数不会触发失效，最多滞后 FEED_CACHE_TIMEOUT 秒。
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+FEED_CACHE_ALIAS = getattr(settings, "FEED_CACHE_ALIAS", "feed")
+FEED_CACHE_TIMEOUT = getattr(settings, "FEED_CACHE_TIMEOUT", 300)
+
+# 参与缓存键的查询参数，带有其它参数（如搜索词）的请求不走缓存
+CACHEABLE_PARAMS = ("category", "tag", "month", "cursor")
+
+VERSION_KEY = "feed:version"
+HITS_KEY = "feed:hits"
+MISSES_KEY = "feed:misses"
+
+
+def get_cache():
+    return caches[FEED_CACHE_ALIAS]
+
+
+def _incr(key, delta=1):
+    cache = get_cache()
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # 键不存在时初始化；并发下可能丢失一次计数，统计用途可以接受
+        cache.set(key, delta, None)
+        return delta
+
+
+def get_version():
+    version = get_cache().get(VERSION_KEY)
+    if version is None:
+        get_cache().add(VERSION_KEY, 1, None)
+        version = get_cache().get(VERSION_KEY, 1)
+    return version
+
+
+def bump_version():
+    """使所有已缓存的列表页失效"""
+    get_cache().add(VERSION_KEY, 1, None)
+    return _incr(VERSION_KEY)
+
+
+def is_cacheable(request):
+    """只缓存匿名用户的GET请求，且查询参数都在 CACHEABLE_PARAMS 内"""
+    if request.method != "GET":
+        return False
+    if request.user.is_authenticated:
+        return False
+    return all(key in CACHEABLE_PARAMS for key in request.GET)
+
+
+def make_key(request):
+    parts = [str(get_version())]
+    parts += [f"{name}={request.GET.get(name, '')}" for name in CACHEABLE_PARAMS]
+    digest = hashlib.md5("&".join(parts).encode("utf-8")).hexdigest()
+    return f"feed:page:{digest}"
+
+
+def get_response(request):
+    """命中时返回重建的 HttpResponse，未命中返回None；同时累计命中/未命中次数"""
+    cached = get_cache().get(make_key(request))
+    if cached is None:
+        _incr(MISSES_KEY)
+        return None
+    _incr(HITS_KEY)
+    content, content_type = cached
+    response = HttpResponse(content, content_type=content_type)
+    response["X-Feed-Cache"] = "hit"
+    return response
+
+
+def store_response(request, response):
+    """作为 post_render_callback 使用：页面渲染完成后写入缓存"""
+    if response.status_code == 200:
+        get_cache().set(
+            make_key(request),
+            (response.content, response["Content-Type"]),
+            FEED_CACHE_TIMEOUT,
+        )
+    return response
+
+
+def get_stats():
+    cache = get_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else 0.0,
+        "version": get_version(),
+        "backend": settings.CACHES[FEED_CACHE_ALIAS]["BACKEND"],
+    }
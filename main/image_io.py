@@ -0,0 +1,120 @@
+"""
+照片解码
+
+缩略图和各尺寸版本都经过 open_image()，保证解码一张照片占用的内存与原图分辨率基本无关：
+- JPEG 用 draft 模式让 libjpeg 在解码时直接按 1/2、1/4、1/8 缩小（DCT 缩放），50MP 的原图只解出目标尺寸几倍大的像素；
+- 其它格式无法在解码时缩小，解码后立即用 reduce() 整数倍缩小，再交给调用方精细缩放；
+- 打开时只读文件头，像素数超过 IMAGE_MAX_PIXELS 直接拒绝（解压炸弹），同时设置 Pillow 自身的上限；
+- 按 EXIF 方向旋转到正向，手机竖拍的照片生成的缩略图和各尺寸版本不再横躺；
+- 每个进程有 IMAGE_MEMORY_BUDGET 字节的解码预算，按预估的解码后大小预留，预算不足时等待，
+  单张超过预算的图片直接拒绝。并发上传或进程池里多张大图同时处理时，峰值内存不超过预算。
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from PIL import Image
+
+from main.photo_metadata import ORIENTATION_TRANSPOSE, TAG_ORIENTATION
+
+IMAGE_MAX_PIXELS = getattr(settings, "IMAGE_MAX_PIXELS", 64_000_000)
+IMAGE_MEMORY_BUDGET = getattr(settings, "IMAGE_MEMORY_BUDGET", 256 * 1024 ** 2)
+# 等待解码预算的最长时间（秒）
+BUDGET_TIMEOUT = 30
+# 解码时保留目标尺寸的倍数，之后再用高质量滤镜缩放，效果与直接缩放基本一致
+REDUCING_GAP = 2
+
+# Pillow 超过该值告警、超过两倍抛 DecompressionBombError；这里与自己的检查保持一致
+Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+
+
+class ImageTooLarge(ValueError):
+    """像素数或解码所需内存超过限制，重试也不会成功"""
+
+
+def reduce_mode(img):
+    """
+    reduce() 不支持调色板（GIF、调色板 PNG）、二值和 16 位灰度图，需要先转换的目标模式；不需要转换时返回 None。
+    调色板图按索引取平均没有意义，转成 RGB（有透明色时 RGBA）后再缩小
+    """
+    if img.mode in ("P", "PA"):
+        return "RGBA" if img.mode == "PA" or "transparency" in img.info else "RGB"
+    if img.mode == "1":
+        return "L"
+    if img.mode.startswith("I;16"):
+        return "I"
+    return None
+
+
+def estimate_bytes(size, mode, converted_mode=None):
+    """
+    解码后像素数据的大致字节数：Pillow 中单通道 8 位图每像素 1 字节，其余按 4 字节；
+    缩小前需要转换模式时，转换出的副本与原图同时存在，一并计入
+    """
+    def bytes_per_pixel(m):
+        return 1 if m in ("1", "L", "P") else 4
+
+    total = bytes_per_pixel(mode)
+    if converted_mode is not None:
+        total += bytes_per_pixel(converted_mode)
+    return size[0] * size[1] * total
+
+
+class MemoryBudget:
+    """进程内的解码内存预算，各线程按预估字节数预留和归还"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def reserve(self, nbytes, timeout=BUDGET_TIMEOUT):
+        if nbytes > self.limit:
+            raise ImageTooLarge(f"解码需要约 {nbytes // 1024 // 1024} MB，超过单进程预算")
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.used + nbytes <= self.limit, timeout):
+                raise TimeoutError("等待解码内存预算超时")
+            self.used += nbytes
+            self.peak = max(self.peak, self.used)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.used -= nbytes
+                self._cond.notify_all()
+
+
+budget = MemoryBudget(IMAGE_MEMORY_BUDGET)
+
+
+@contextmanager
+def open_image(path, target_size):
+    """
+    打开图片并解码为不小于 target_size × REDUCING_GAP（两边都满足）的尺寸，已按 EXIF 方向转正，调用方再精细缩放。
+    解码期间占用进程的内存预算；退出上下文后预算归还，调用方应在上下文内完成缩放和保存。
+    """
+    with Image.open(path) as img:
+        width, height = img.size
+        if width * height > IMAGE_MAX_PIXELS:
+            raise ImageTooLarge(f"图片 {width}x{height} 像素过多")
+
+        # 方向在文件头里，需在 draft/reduce 之前读取，缩小后的新图片不再带 EXIF
+        transpose = ORIENTATION_TRANSPOSE.get(img.getexif().get(TAG_ORIENTATION))
+        wanted = (target_size * REDUCING_GAP, target_size * REDUCING_GAP)
+        if img.format == "JPEG":
+            # 只改变解码器参数，不读取像素；之后 img.size 是缩小后的尺寸
+            img.draft(None, wanted)
+
+        factor = min(img.size[0] // wanted[0], img.size[1] // wanted[1])
+        converted_mode = reduce_mode(img) if factor > 1 else None
+        with budget.reserve(estimate_bytes(img.size, img.mode, converted_mode)):
+            img.load()
+            if factor > 1:
+                if converted_mode is not None:
+                    img = img.convert(converted_mode)
+                img = img.reduce(factor)
+            if transpose is not None:
+                img = img.transpose(transpose)
+            yield img
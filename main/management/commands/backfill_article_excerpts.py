@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from main.models import Articles
+
+
+class Command(BaseCommand):
+    help = "为已有文章回填纯文本摘要和字数"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help="每批处理的文章数")
+        parser.add_argument('--only-missing', action='store_true', help="只处理摘要为空的文章")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Articles.objects.order_by('pk').only('pk', 'content')
+        if options['only_missing']:
+            queryset = queryset.filter(excerpt='')
+
+        total = 0
+        last_pk = 0
+        # 按主键分批读取，避免一次把全部富文本加载进内存
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            for article in batch:
+                article.refresh_excerpt()
+            Articles.objects.bulk_update(batch, ['excerpt', 'word_count'])
+            total += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f"已处理 {total} 篇")
+
+        self.stdout.write(self.style.SUCCESS(f"回填完成，共 {total} 篇文章"))
@@ -0,0 +1,85 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from main.models import Photo
+from main.photo_metadata import ROTATED_ORIENTATIONS, apply_metadata, read_metadata
+
+
+class Command(BaseCommand):
+    help = "为已有照片从文件头读取 EXIF 拍摄时间和 GPS 地点（只填空字段），缩略图没有按方向转正的照片重新生成"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help="每批写回数据库的照片数")
+        parser.add_argument('--all', action='store_true', help="检查全部照片，默认只检查缺少拍摄时间或地点的照片")
+        parser.add_argument('--dry-run', action='store_true', help="只统计，不修改")
+
+    def handle(self, *args, **options):
+        photos = Photo.objects.filter(media_type="photo").exclude(file="").order_by()
+        if not options['all']:
+            photos = photos.filter(Q(shot_at__isnull=True) | Q(location__isnull=True) | Q(location=""))
+        photos = photos.only('pk', 'file', 'shot_at', 'location', 'thumbnail', 'thumbnail_status')
+
+        stats = {"checked": 0, "unreadable": 0, "shot_at": 0, "location": 0, "rotated": 0}
+        changed, rotated = [], []
+        for photo in photos.iterator(chunk_size=options['batch_size']):
+            stats["checked"] += 1
+            try:
+                with photo.file.storage.open(photo.file.name, "rb") as f:
+                    metadata = read_metadata(f)
+            except OSError:
+                metadata = None
+            if metadata is None:
+                stats["unreadable"] += 1
+                continue
+            fields = apply_metadata(photo, metadata)
+            for field in fields:
+                stats[field] += 1
+            if fields:
+                changed.append(photo)
+            if self.thumbnail_unrotated(photo, metadata):
+                rotated.append(photo.pk)
+                stats["rotated"] += 1
+            if len(changed) >= options['batch_size']:
+                self.flush(changed, options['dry_run'])
+                changed = []
+        self.flush(changed, options['dry_run'])
+
+        if rotated and not options['dry_run']:
+            for start in range(0, len(rotated), 500):
+                Photo.objects.filter(pk__in=rotated[start:start + 500]).update(
+                    thumbnail_status=Photo.THUMBNAIL_PENDING, thumbnail_attempts=0, thumbnail_due_at=timezone.now(),
+                )
+        self.stdout.write(
+            f"检查 {stats['checked']} 张，无法读取 {stats['unreadable']} 张；补充拍摄时间 {stats['shot_at']} 张，"
+            f"地点 {stats['location']} 张；{stats['rotated']} 张需按方向重新生成缩略图"
+            + ("（未修改）" if options['dry_run'] else "")
+        )
+
+    @staticmethod
+    def thumbnail_unrotated(photo, metadata):
+        """
+        之前同步生成的缩略图没有按 EXIF 方向旋转。需要转 90 度的照片比较缩略图和原图的横竖：
+        两者一致说明缩略图还没转正（只读缩略图文件头）。
+        """
+        if metadata["orientation"] not in ROTATED_ORIENTATIONS or photo.thumbnail_status != Photo.THUMBNAIL_DONE:
+            return False
+        width, height = metadata["size"]
+        if width == height or not photo.thumbnail:
+            return False
+        try:
+            with default_storage.open(photo.thumbnail.name, "rb") as f:
+                thumb = read_metadata(f)
+        except OSError:
+            return True
+        if thumb is None:
+            return True
+        thumb_width, thumb_height = thumb["size"]
+        return (thumb_width > thumb_height) == (width > height)
+
+    @staticmethod
+    def flush(photos, dry_run):
+        if photos and not dry_run:
+            # bulk_update 不调用 save()，不会触发 full_clean 和信号
+            Photo.objects.bulk_update(photos, ['shot_at', 'location'])
@@ -0,0 +1,47 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from main.models import Photo
+
+
+class Command(BaseCommand):
+    help = "把缺少缩略图的照片重新标记为待生成，由 process_thumbnails 在后台补齐"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--failed', action='store_true', help="同时重试已标记为生成失败的照片")
+        parser.add_argument('--check-files', action='store_true',
+                            help="逐张检查已生成的缩略图文件是否还在磁盘上，丢失的重新生成")
+        parser.add_argument('--dry-run', action='store_true', help="只统计，不修改")
+
+    def handle(self, *args, **options):
+        photos = Photo.objects.filter(media_type="photo").exclude(file="")
+        missing = Q(thumbnail__isnull=True) | Q(thumbnail="")
+        # 正在排队或生成中的照片不动
+        statuses = [Photo.THUMBNAIL_DONE, Photo.THUMBNAIL_SKIPPED]
+        if options['failed']:
+            statuses.append(Photo.THUMBNAIL_FAILED)
+        ids = set(photos.filter(missing, thumbnail_status__in=statuses).values_list('pk', flat=True))
+
+        if options['check_files']:
+            done = photos.filter(thumbnail_status=Photo.THUMBNAIL_DONE).exclude(missing)
+            for pk, name in done.values_list('pk', 'thumbnail').iterator():
+                if not default_storage.exists(name):
+                    ids.add(pk)
+
+        if options['dry_run']:
+            self.stdout.write(f"需要重新生成缩略图的照片：{len(ids)} 张")
+            return
+
+        updated = 0
+        ids = list(ids)
+        for start in range(0, len(ids), 500):
+            updated += Photo.objects.filter(pk__in=ids[start:start + 500]).update(
+                thumbnail=None,
+                thumbnail_status=Photo.THUMBNAIL_PENDING,
+                thumbnail_attempts=0,
+                thumbnail_error="",
+                thumbnail_due_at=timezone.now(),
+            )
+        self.stdout.write(self.style.SUCCESS(f"已将 {updated} 张照片标记为待生成，运行 process_thumbnails 生成缩略图"))
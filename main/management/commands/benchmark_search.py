@@ -0,0 +1,277 @@
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import whoosh
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from haystack.constants import DJANGO_CT, DJANGO_ID, ID
+
+from main.models import Articles
+from main.whoosh_cn_backend import WhooshSearchBackend
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# 合成语料的词表：育儿常见主题词，标题和正文由它们随机组合
+SUBJECTS = ["宝宝", "新生儿", "婴儿", "幼儿", "孩子", "二胎", "早产儿", "双胞胎"]
+TOPICS = [
+    "辅食", "母乳", "奶粉", "睡眠", "湿疹", "发烧", "腹泻", "便秘", "出牙", "疫苗", "黄疸", "断奶",
+    "夜醒", "翻身", "爬行", "走路", "说话", "过敏", "感冒", "咳嗽", "补钙", "补铁", "体检", "早教",
+]
+ACTIONS = ["护理", "经验", "注意事项", "怎么办", "全攻略", "误区", "小技巧", "心得", "记录", "方法"]
+SENTENCES = [
+    "{s}{n}个月开始{t}，一开始很不适应。",
+    "医生建议{t}期间多观察{s}的精神状态。",
+    "我们家{s}{t}的时候哭闹得厉害，后来慢慢好了。",
+    "关于{t}，网上说法很多，最好还是咨询儿科医生。",
+    "{t}要循序渐进，每次只添加一种新的食物。",
+    "记录一下{s}第{n}周的{t}情况，供新手爸妈参考。",
+    "晚上{t}的问题困扰了我们很久，分享几个{a}。",
+    "{s}体重增长正常，{t}后精神也不错。",
+]
+CATEGORY_COUNT = 20
+TAG_COUNT = 60
+# 不含短语查询：jieba 分词器的 token.pos 是字符偏移而不是词序号，短语查询永远没有命中，计时没有意义
+QUERY_KINDS = ("term", "fuzzy", "faceted")
+FACETS = ["category_ids", "tag_ids", "month"]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(samples):
+    """毫秒耗时列表 -> 统计"""
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.mean(samples), 3) if samples else None,
+        "p50_ms": round(percentile(samples, 50), 3) if samples else None,
+        "p95_ms": round(percentile(samples, 95), 3) if samples else None,
+        "p99_ms": round(percentile(samples, 99), 3) if samples else None,
+        "max_ms": round(max(samples), 3) if samples else None,
+    }
+
+
+def max_rss_mb():
+    if resource is None:
+        return None
+    # Linux 上 ru_maxrss 单位是 KB，macOS 上是字节
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / 1024 / (1024 if platform.system() == "Darwin" else 1), 1)
+
+
+class Command(BaseCommand):
+    help = "搜索后端基准测试：生成合成的育儿文章语料写入临时索引，测量建索引吞吐、各类查询延迟、相似文章耗时和内存，结果存为JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--docs', type=int, default=10000, help="合成文档数（建议 1万 ~ 100万）")
+        parser.add_argument('--queries', type=int, default=200, help="每类查询的次数")
+        parser.add_argument('--mlt', type=int, default=50, help="more_like_this 的次数")
+        parser.add_argument('--storage', choices=['ram', 'file'], default='ram', help="临时索引存放在内存还是磁盘")
+        parser.add_argument('--seed', type=int, default=20240601, help="随机种子，相同种子生成相同的语料和查询")
+        parser.add_argument('--output', help="结果JSON文件，默认打印到标准输出")
+        parser.add_argument('--compare', help="与之前保存的结果JSON对比")
+        parser.add_argument('--keep', action='store_true', help="保留磁盘上的临时索引目录")
+
+    def handle(self, *args, **options):
+        if options['docs'] <= 0:
+            raise CommandError("--docs 必须大于0")
+        self.random = random.Random(options['seed'])
+        path = tempfile.mkdtemp(prefix="whoosh_bench_")
+        # 复用 default 连接的索引定义生成 schema，但写入独立的临时索引；关闭结果缓存，测的是真实查询耗时
+        backend = WhooshSearchBackend(
+            "default", PATH=path, STORAGE=options['storage'], RESULT_CACHE_SIZE=0,
+        )
+        try:
+            backend.setup()
+            if options['storage'] == 'ram':
+                backend.delete_index()
+            result = self.run(backend, options)
+        finally:
+            if not options['keep']:
+                shutil.rmtree(path, ignore_errors=True)
+
+        output = json.dumps(result, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], "w", encoding="utf-8") as f:
+                f.write(output)
+            self.stdout.write(f"结果已写入 {options['output']}")
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            with open(options['compare'], encoding="utf-8") as f:
+                self.compare(json.load(f), result)
+
+    def run(self, backend, options):
+        rss_before = max_rss_mb()
+        indexing = self.build_corpus(backend, options['docs'])
+        stats = backend.index_stats()
+
+        queries = {}
+        for kind in QUERY_KINDS:
+            self.stdout.write(f"查询：{kind}")
+            queries[kind] = self.run_queries(backend, kind, options['queries'])
+        # 合成语料里每类查询都应有命中；平均命中为0说明查询或分词出了问题，这一类的耗时只是空查询的耗时
+        warnings = [f"{kind} 查询平均命中为0，耗时统计无效" for kind, summary in queries.items()
+                    if not summary["mean_hits"]]
+        for warning in warnings:
+            self.stderr.write(warning)
+
+        self.stdout.write("相似文章：more_like_this")
+        mlt_samples = []
+        for _ in range(options['mlt']):
+            article = Articles(pk=self.random.randint(1, options['docs']))
+            started = time.perf_counter()
+            backend.more_like_this(article, end_offset=10, models=[Articles])
+            mlt_samples.append((time.perf_counter() - started) * 1000)
+
+        return {
+            "meta": {
+                "docs": options['docs'],
+                "storage": options['storage'],
+                "seed": options['seed'],
+                "whoosh": ".".join(str(v) for v in whoosh.__version__),
+                "python": platform.python_version(),
+                "finished_at": timezone.now().isoformat(),
+            },
+            "indexing": indexing,
+            "queries": queries,
+            "warnings": warnings,
+            "more_like_this": summarize(mlt_samples),
+            "relevance": self.check_relevance(backend, options['docs'], options['queries']),
+            "memory": {"max_rss_mb_before": rss_before, "max_rss_mb_after": max_rss_mb()},
+            "index": stats,
+        }
+
+    def make_document(self, n):
+        rnd = self.random
+        subject, topic, action = rnd.choice(SUBJECTS), rnd.choice(TOPICS), rnd.choice(ACTIONS)
+        title = f"{subject}{topic}{action}"
+        body = "".join(
+            rnd.choice(SENTENCES).format(s=rnd.choice(SUBJECTS), t=rnd.choice(TOPICS), a=rnd.choice(ACTIONS),
+                                         n=rnd.randint(1, 36))
+            for _ in range(rnd.randint(5, 20))
+        )
+        tag_ids = sorted(rnd.sample(range(1, TAG_COUNT + 1), rnd.randint(0, 3)))
+        category_id = rnd.randint(1, CATEGORY_COUNT)
+        created = datetime(2023, 1, 1) + timedelta(minutes=rnd.randint(0, 3 * 365 * 24 * 60))
+        return {
+            ID: f"main.articles.{n}",
+            DJANGO_CT: "main.articles",
+            DJANGO_ID: str(n),
+            "text": f"{title}\n{body}\n{topic}",
+            "title": title,
+            "tags": " ".join(TOPICS[i % len(TOPICS)] for i in tag_ids),
+            "categories": TOPICS[category_id % len(TOPICS)],
+            "author": f"user{rnd.randint(1, 500)}",
+            "state": 1,
+            "created": created,
+            "category_ids": str(category_id),
+            "tag_ids": ",".join(str(i) for i in tag_ids),
+            "month": created.strftime("%Y-%m"),
+        }
+
+    def build_corpus(self, backend, count):
+        self.stdout.write(f"生成并写入 {count} 篇合成文章……")
+        # 文档直接按索引字段构造，不经过数据库；分词和写入走与线上相同的 schema 和 jieba 分词器
+        schema_names = set(backend.schema.names())
+        writer = backend.index.writer()
+        started = time.perf_counter()
+        for n in range(1, count + 1):
+            doc = {key: value for key, value in self.make_document(n).items() if key in schema_names}
+            writer.add_document(**doc)
+            if n % 10000 == 0:
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"  {n} 篇，{n / elapsed:.0f} 篇/秒")
+        add_seconds = time.perf_counter() - started
+        commit_started = time.perf_counter()
+        writer.commit()
+        commit_seconds = time.perf_counter() - commit_started
+        total = add_seconds + commit_seconds
+        return {
+            "add_seconds": round(add_seconds, 3),
+            "commit_seconds": round(commit_seconds, 3),
+            "docs_per_second": round(count / total, 1),
+        }
+
+    def make_query(self, kind):
+        rnd = self.random
+        if kind == "fuzzy":
+            return f"{rnd.choice(TOPICS)}~1", {}
+        if kind == "faceted":
+            return rnd.choice(TOPICS), {"facets": FACETS}
+        return f"{rnd.choice(TOPICS)} {rnd.choice(ACTIONS)}", {}
+
+    def run_queries(self, backend, kind, count):
+        # 先各跑几次预热，不计入统计
+        for _ in range(min(5, count)):
+            query, kwargs = self.make_query(kind)
+            backend.search(query, end_offset=10, models=[Articles], **kwargs)
+        samples, hits = [], []
+        for _ in range(count):
+            query, kwargs = self.make_query(kind)
+            started = time.perf_counter()
+            result = backend.search(query, end_offset=10, models=[Articles], **kwargs)
+            samples.append((time.perf_counter() - started) * 1000)
+            hits.append(result.get("hits", 0))
+        summary = summarize(samples)
+        summary["mean_hits"] = round(statistics.mean(hits), 1) if hits else 0
+        return summary
+
+    def check_relevance(self, backend, docs, count):
+        """
+        相关性回归：用某篇文章的完整标题检索，它应出现在前10条结果中。
+        标题字段有加权，调整分词或权重后这个比例明显下降说明排序退化了。
+        """
+        checked = found = 0
+        with backend.index.searcher() as searcher:
+            titles = [searcher.document(django_id=str(self.random.randint(1, docs)))["title"]
+                      for _ in range(min(count, docs))]
+        for title in titles:
+            result = backend.search(f"title:({title})", end_offset=10, models=[Articles])
+            # 合成标题重复较多，只要求同标题的文章排在前10
+            checked += 1
+            found += title in [r.title for r in result.get("results", [])]
+        return {"checked": checked, "title_recall_at_10": round(found / checked, 3) if checked else None}
+
+    def compare(self, previous, current):
+        """打印关键指标相对上次结果的变化"""
+        def metric(result, *keys):
+            for key in keys:
+                result = (result or {}).get(key)
+            return result
+
+        rows = [("建索引 篇/秒", ("indexing", "docs_per_second"), True)]
+        for kind in QUERY_KINDS:
+            rows.append((f"{kind} p50", ("queries", kind, "p50_ms"), False))
+            rows.append((f"{kind} p99", ("queries", kind, "p99_ms"), False))
+        rows += [
+            ("more_like_this p50", ("more_like_this", "p50_ms"), False),
+            ("标题召回@10", ("relevance", "title_recall_at_10"), True),
+            ("最大内存 MB", ("memory", "max_rss_mb_after"), False),
+            ("索引大小 字节", ("index", "size_bytes"), False),
+        ]
+        self.stdout.write("与上次结果对比：")
+        for label, keys, higher_is_better in rows:
+            old, new = metric(previous, *keys), metric(current, *keys)
+            if old in (None, 0) or new is None:
+                self.stdout.write(f"  {label}: {old} -> {new}")
+                continue
+            change = (new - old) / old * 100
+            better = change > 0 if higher_is_better else change < 0
+            flag = "" if abs(change) < 5 else ("  改善" if better else "  退化")
+            self.stdout.write(f"  {label}: {old} -> {new} ({change:+.1f}%){flag}")
@@ -0,0 +1,43 @@
+import os
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import Category, MilestoneType, Tag, Vaccine
+
+# 名称里的括号、标点、空格都作为分隔，只保留连续的汉字/字母/数字片段
+WORD_RE = re.compile(r"[一-鿿A-Za-z0-9]{2,}")
+
+
+class Command(BaseCommand):
+    help = "根据疫苗、里程碑类型、分类、标签名称生成 jieba 自定义词典，进程启动时加载"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="输出文件，默认为 settings.JIEBA_USERDICT")
+
+    def handle(self, *args, **options):
+        output = options['output'] or getattr(settings, "JIEBA_USERDICT", None)
+        if not output:
+            raise CommandError("未配置 JIEBA_USERDICT，请用 --output 指定输出文件")
+
+        sources = {
+            "疫苗": Vaccine.objects.values_list('name', flat=True),
+            "里程碑类型": MilestoneType.objects.values_list('name', flat=True),
+            "分类": Category.objects.values_list('classification', flat=True),
+            "标签": Tag.objects.values_list('tag', flat=True),
+        }
+        words = set()
+        for label, names in sources.items():
+            found = {word for name in names for word in WORD_RE.findall(name)}
+            self.stdout.write(f"{label}：{len(found)} 个词")
+            words |= found
+
+        os.makedirs(os.path.dirname(str(output)), exist_ok=True)
+        # 不写词频，由 jieba 按 suggest_freq 自动计算出保证整词切分的频率
+        tmp_path = f"{output}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for word in sorted(words):
+                f.write(f"{word}\n")
+        os.replace(tmp_path, output)
+        self.stdout.write(self.style.SUCCESS(f"已写入 {len(words)} 个词到 {output}，重启进程后生效"))
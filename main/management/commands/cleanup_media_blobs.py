@@ -0,0 +1,132 @@
+import os
+import posixpath
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from main.models import MediaBlob, Photo
+from main.storage import BLOB_DIR, digest_from_name, get_media_storage
+from main.thumbnails import thumbnail_name
+
+TRASH_SUFFIX = ".deleting"
+
+
+class Command(BaseCommand):
+    help = "清理内容寻址存储中没有照片引用的文件：先校正引用数，再删除引用数为0且超过保留期的文件和未登记的文件"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help="保留期：引用数归零或最近一次被复用后至少经过这么久才删除")
+        parser.add_argument('--dry-run', action='store_true', help="只统计，不删除")
+
+    def handle(self, *args, **options):
+        self.storage = get_media_storage()
+        self.dry_run = options['dry_run']
+        self.cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        self.cutoff_ts = self.cutoff.timestamp()
+        self.stats = {"recounted": 0, "blobs": 0, "stray": 0, "partial": 0, "bytes": 0}
+
+        self.recount()
+        self.remove_orphan_blobs()
+        self.remove_stray_files()
+
+        self.stdout.write(
+            f"校正引用数 {self.stats['recounted']} 条；{'将删除' if self.dry_run else '已删除'}"
+            f"无引用文件 {self.stats['blobs']} 个、未登记文件 {self.stats['stray']} 个、"
+            f"残留临时文件 {self.stats['partial']} 个，共 {self.stats['bytes'] / 1024 / 1024:.1f} MB"
+        )
+
+    def recount(self):
+        """引用数以外键实际数量为准（信号漏处理、手工改库时会有偏差）"""
+        drifted = (MediaBlob.objects.annotate(actual=Count('photos'))
+                   .exclude(ref_count=F('actual')).values_list('pk', 'actual'))
+        for digest, actual in drifted:
+            self.stats["recounted"] += 1
+            if not self.dry_run:
+                updates = {"ref_count": actual}
+                if actual == 0:
+                    updates["released_at"] = timezone.now()
+                MediaBlob.objects.filter(pk=digest).update(**updates)
+
+    def remove_orphan_blobs(self):
+        expired = Q(released_at__lt=self.cutoff) | Q(released_at__isnull=True, created_at__lt=self.cutoff)
+        candidates = MediaBlob.objects.filter(expired, ref_count__lte=0).values_list('pk', flat=True)
+        for digest in list(candidates):
+            with transaction.atomic():
+                blob = MediaBlob.objects.select_for_update().filter(pk=digest, ref_count__lte=0).first()
+                if blob is None or blob.photos.exists():
+                    continue
+                if not self.delete_file(blob.name):
+                    continue
+                self.stats["blobs"] += 1
+                if not self.dry_run:
+                    blob.delete()
+
+    def delete_file(self, name, count_bytes=True):
+        """
+        先把文件改名再检查修改时间：改名之后的上传找不到它，会写入新文件；
+        改名之前被复用过（修改时间在保留期内）则改回原名，不删除。返回是否删除（或将删除）
+        """
+        path = self.storage.path(name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return True
+        if stat.st_mtime >= self.cutoff_ts:
+            return False
+        if count_bytes:
+            self.stats["bytes"] += stat.st_size
+        if self.dry_run:
+            return True
+        trash = path + TRASH_SUFFIX
+        os.rename(path, trash)
+        if os.stat(trash).st_mtime >= self.cutoff_ts:
+            if not os.path.exists(path):
+                os.rename(trash, path)
+            else:
+                os.remove(trash)
+            return False
+        os.remove(trash)
+        thumb = self.storage.path(thumbnail_name(name))
+        if os.path.exists(thumb):
+            os.remove(thumb)
+        return True
+
+    def remove_stray_files(self):
+        """磁盘上有、数据库里没有登记的内容寻址文件（如上传后事务回滚），以及中断上传留下的临时文件"""
+        upload_dir = Photo._meta.get_field('file').upload_to.rstrip('/')
+        root = self.storage.path(posixpath.join(upload_dir, BLOB_DIR))
+        if not os.path.isdir(root):
+            return
+        known = set(MediaBlob.objects.values_list('pk', flat=True))
+        for entry in os.scandir(root):
+            if not entry.is_dir():
+                continue
+            for file in os.scandir(entry.path):
+                if not file.is_file():
+                    continue
+                if entry.name == "tmp":
+                    if file.stat().st_mtime < self.cutoff_ts:
+                        self.stats["partial"] += 1
+                        self.stats["bytes"] += file.stat().st_size
+                        if not self.dry_run:
+                            os.remove(file.path)
+                    continue
+                if file.name.endswith(TRASH_SUFFIX):
+                    # 上次清理中断留下的文件，改名后已不会被复用
+                    if time.time() - file.stat().st_mtime > 3600 and not self.dry_run:
+                        os.remove(file.path)
+                    continue
+                name = posixpath.join(upload_dir, BLOB_DIR, entry.name, file.name)
+                digest = digest_from_name(name)
+                if digest is None or digest in known:
+                    continue
+                # 照片行指向它但没有登记（信号未执行）时不删除，等下次校正
+                if Photo.objects.filter(file=name).exists():
+                    continue
+                if self.delete_file(name):
+                    self.stats["stray"] += 1
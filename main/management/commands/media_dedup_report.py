@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import F, Sum
+
+from main.models import MediaBlob
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Command(BaseCommand):
+    help = "统计 media/ 下的重复文件：内容寻址存储已节省的空间，以及旧文件中内容相同、可以合并回收的空间"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10, help="列出回收空间最多的前 N 组重复文件")
+        parser.add_argument('--json', action='store_true', help="以 JSON 输出")
+
+    def handle(self, *args, **options):
+        root = str(settings.MEDIA_ROOT)
+        by_size = defaultdict(list)
+        total_files = total_bytes = 0
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                if filename.endswith((".part", ".tmp", ".deleting")):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    continue
+                total_files += 1
+                total_bytes += size
+                if size:
+                    by_size[size].append(path)
+
+        # 大小不同的文件内容一定不同，只对大小相同的文件计算摘要
+        groups = []
+        for size, paths in by_size.items():
+            if len(paths) < 2:
+                continue
+            by_digest = defaultdict(list)
+            for path in paths:
+                try:
+                    by_digest[file_digest(path)].append(path)
+                except OSError:
+                    continue
+            for digest, same in by_digest.items():
+                if len(same) > 1:
+                    groups.append({
+                        "digest": digest,
+                        "size": size,
+                        "files": sorted(os.path.relpath(p, root) for p in same),
+                        "reclaimable_bytes": size * (len(same) - 1),
+                    })
+        groups.sort(key=lambda g: g["reclaimable_bytes"], reverse=True)
+
+        blobs = MediaBlob.objects.filter(ref_count__gt=0).aggregate(
+            stored=Sum('size'), referenced=Sum(F('size') * F('ref_count')),
+        )
+        stored = blobs["stored"] or 0
+        referenced = blobs["referenced"] or 0
+        report = {
+            "files": total_files,
+            "bytes": total_bytes,
+            "blobs": MediaBlob.objects.filter(ref_count__gt=0).count(),
+            "orphan_blobs": MediaBlob.objects.filter(ref_count__lte=0).count(),
+            "dedup_saved_bytes": referenced - stored,
+            "duplicate_groups": len(groups),
+            "duplicate_files": sum(len(g["files"]) - 1 for g in groups),
+            "reclaimable_bytes": sum(g["reclaimable_bytes"] for g in groups),
+            "top": groups[:options['top']],
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+            return
+
+        mb = 1024 * 1024
+        self.stdout.write(f"media/ 共 {report['files']} 个文件，{report['bytes'] / mb:.1f} MB")
+        self.stdout.write(
+            f"内容寻址存储：{report['blobs']} 份内容，重复上传已节省 {report['dedup_saved_bytes'] / mb:.1f} MB；"
+            f"待清理无引用内容 {report['orphan_blobs']} 份"
+        )
+        self.stdout.write(
+            f"磁盘上内容相同的文件 {report['duplicate_groups']} 组，多余 {report['duplicate_files']} 个，"
+            f"可回收 {report['reclaimable_bytes'] / mb:.1f} MB"
+        )
+        for group in report["top"]:
+            self.stdout.write(f"  {group['digest'][:12]}  {group['size'] / 1024:.0f} KB × {len(group['files'])}")
+            for name in group["files"]:
+                self.stdout.write(f"    {name}")
@@ -0,0 +1,90 @@
+import json
+import os
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from haystack import connections
+
+
+def parse_window(value):
+    """'02:00-05:00' -> (time(2, 0), time(5, 0))；允许跨零点，如 '23:00-04:00'"""
+    try:
+        start, end = value.split("-")
+        return (datetime.strptime(start.strip(), "%H:%M").time(),
+                datetime.strptime(end.strip(), "%H:%M").time())
+    except ValueError:
+        raise CommandError(f"时间窗口格式应为 HH:MM-HH:MM：{value}")
+
+
+def in_window(now, window):
+    start, end = window
+    if start <= end:
+        return start <= now < end
+    return now >= start or now < end
+
+
+class Command(BaseCommand):
+    help = "按段数阈值合并搜索索引的段：低峰时段内合并成一个段，其它时间段数过多时只合并小段"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=int, default=getattr(settings, "WHOOSH_MERGE_THRESHOLD", 10),
+                            help="段数超过该值才合并")
+        parser.add_argument('--window', default=getattr(settings, "WHOOSH_MERGE_WINDOW", "02:00-05:00"),
+                            help="低峰时段（本地时间），在此时段内做完整合并")
+        parser.add_argument('--force', action='store_true', help="忽略阈值和时段，立即合并成一个段")
+        parser.add_argument('--interval', type=float, default=600, help="循环模式下的检查间隔（秒）")
+        parser.add_argument('--once', action='store_true', help="检查一次后退出，适合定时任务调用")
+        parser.add_argument('--stats-file', default=getattr(settings, "WHOOSH_MERGE_STATS_FILE", None),
+                            help="合并统计写入的JSON文件")
+        parser.add_argument('--using', default='default', help="Haystack 连接名")
+
+    def handle(self, *args, **options):
+        window = parse_window(options['window'])
+        backend = connections[options['using']].get_backend()
+        if not hasattr(backend, "merge_segments"):
+            raise CommandError("当前搜索后端不支持合并索引段")
+
+        while True:
+            self.check(backend, window, options)
+            if options['once'] or options['force']:
+                break
+            time.sleep(options['interval'])
+
+    def check(self, backend, window, options):
+        stats = backend.index_stats()
+        segments = stats["segments"]
+        threshold = options['threshold']
+        off_peak = in_window(timezone.localtime().time(), window)
+
+        if options['force'] or (off_peak and segments > threshold):
+            optimize = True
+        elif segments > threshold * 3:
+            # 高峰期段数严重超标时先合并小段，开销小，完整合并留到低峰时段
+            optimize = False
+        else:
+            self.stdout.write(f"当前 {segments} 个段，阈值 {threshold}，{'低峰' if off_peak else '非低峰'}时段，无需合并")
+            return
+
+        result = backend.merge_segments(optimize=optimize)
+        result.update(
+            finished_at=timezone.now().isoformat(),
+            documents=stats["documents"],
+            deleted_documents=stats["deleted_documents"],
+        )
+        self.stdout.write(
+            f"{'完整合并' if optimize else '合并小段'}：{result['segments_before']} -> {result['segments_after']} 个段，"
+            f"耗时 {result['seconds']} 秒"
+        )
+        if options['stats_file']:
+            self.write_stats(options['stats_file'], result)
+
+    @staticmethod
+    def write_stats(path, result):
+        os.makedirs(os.path.dirname(str(path)) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
@@ -0,0 +1,239 @@
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from datetime import datetime
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections as db_connections
+from django.db.models import Q
+from django.utils import timezone
+from haystack import connections
+from haystack.exceptions import NotHandled
+
+from main.models import SearchIndexQueue
+
+CHECKPOINT_FILE = "checkpoint.json"
+# 合并后核对已删除对象时，每次查询的主键数
+REQUEUE_BATCH = 1000
+
+
+def _init_worker():
+    # spawn 方式启动的子进程需要重新初始化 Django；fork 方式下 apps 已就绪
+    import django
+    if not apps.ready:
+        django.setup()
+
+
+def _index_chunk(using, model_label, lo, hi, path, batch_size):
+    """子进程：把主键在 [lo, hi] 内的对象写入 path 下独立的子索引，返回 (文档数, 耗时)"""
+    started = time.monotonic()
+    model = apps.get_model(model_label)
+    index = connections[using].get_unified_index().get_index(model)
+    backend = connections[using].get_backend()
+
+    # 中断后重跑的分段从头写，子索引目录先清空
+    shutil.rmtree(path, ignore_errors=True)
+    subindex = backend.create_subindex(path)
+    writer = subindex.writer()
+    count = 0
+    queryset = index.index_queryset(using=using).filter(pk__gte=lo, pk__lte=hi).order_by("pk")
+    try:
+        for obj in queryset.iterator(chunk_size=batch_size):
+            doc = backend.prepare_document(index, obj)
+            if doc is not None:
+                writer.add_document(**doc)
+                count += 1
+    except Exception:
+        writer.cancel()
+        raise
+    # 每个子索引只有一个段，合并时整体复制
+    writer.commit(merge=False)
+    return count, time.monotonic() - started
+
+
+class Command(BaseCommand):
+    help = "多进程并行重建某个模型的搜索索引：按主键区间分段，各进程写独立子索引，最后一次合并进主索引"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', default='main.articles', help="要重建的模型（app_label.model_name）")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="进程数，默认等于CPU核数")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="每个分段包含的对象数")
+        parser.add_argument('--batch-size', type=int, default=200, help="子进程每次从数据库读取的对象数")
+        parser.add_argument('--resume', action='store_true', help="从上次中断的检查点继续，已完成的分段不再重建")
+        parser.add_argument('--work-dir', help="子索引和检查点目录，默认是索引目录旁的 <PATH>.reindex")
+        parser.add_argument('--keep', action='store_true', help="合并后保留子索引目录")
+        parser.add_argument('--using', default='default', help="Haystack 连接名")
+
+    def handle(self, *args, **options):
+        using = options['using']
+        try:
+            model = apps.get_model(options['model'])
+            connections[using].get_unified_index().get_index(model)
+        except (LookupError, ValueError, NotHandled):
+            raise CommandError(f"模型没有注册搜索索引：{options['model']}")
+        model_label = model._meta.label_lower
+        index = connections[using].get_unified_index().get_index(model)
+
+        backend = connections[using].get_backend()
+        if not getattr(backend, "use_file_storage", False):
+            raise CommandError("并行重建只支持文件存储的 Whoosh 索引")
+        work_dir = options['work_dir'] or f"{str(backend.path).rstrip(os.sep)}.reindex"
+        checkpoint_path = os.path.join(work_dir, CHECKPOINT_FILE)
+
+        checkpoint = self.load_checkpoint(checkpoint_path, model_label) if options['resume'] else None
+        if checkpoint is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            os.makedirs(work_dir)
+            # 开始时间必须早于切分主键区间，之后的新增和修改由合并后的补录覆盖
+            started_at = timezone.now()
+            checkpoint = {
+                "model": model_label,
+                "started_at": started_at.isoformat(),
+                "ranges": self.split_ranges(model, options['chunk_size']),
+                "done": {},
+            }
+            self.save_checkpoint(checkpoint_path, checkpoint)
+
+        ranges = checkpoint["ranges"]
+        pending = [(lo, hi) for lo, hi in ranges if self.chunk_name(lo, hi) not in checkpoint["done"]]
+        self.stdout.write(f"{model_label}：共 {len(ranges)} 个分段，待处理 {len(pending)} 个，{options['workers']} 个进程")
+
+        started = time.monotonic()
+        run_docs = 0
+        if pending:
+            # 主索引在启动子进程前创建好，子进程只写各自的子索引
+            if not backend.setup_complete:
+                backend.setup()
+            run_docs = self.run_workers(using, model_label, pending, work_dir, checkpoint, checkpoint_path, options)
+        index_seconds = time.monotonic() - started
+
+        merge_started = time.monotonic()
+        paths = [os.path.join(work_dir, self.chunk_name(lo, hi)) for lo, hi in ranges]
+        merged = backend.merge_subindexes(paths, replace_model=model)
+        merge_seconds = time.monotonic() - merge_started
+        requeued, removed = self.requeue_changes(model, index, backend, ranges, paths,
+                                                 datetime.fromisoformat(checkpoint["started_at"]))
+
+        total_docs = sum(item["docs"] for item in checkpoint["done"].values())
+        cpu_seconds = sum(item["seconds"] for item in checkpoint["done"].values())
+        stats = {
+            "model": model_label,
+            "chunks": len(ranges),
+            "workers": options['workers'],
+            "documents": total_docs,
+            "merged_documents": merged,
+            "index_seconds": round(index_seconds, 2),
+            "worker_seconds": round(cpu_seconds, 2),
+            "merge_seconds": round(merge_seconds, 2),
+            "requeued": requeued,
+            "requeued_deletes": removed,
+            # 只按本次运行实际建立的文档计算吞吐，续跑时跳过的分段不计入
+            "docs_per_second": round(run_docs / index_seconds, 1) if run_docs else None,
+            "finished_at": timezone.now().isoformat(),
+        }
+        self.stdout.write(json.dumps(stats, ensure_ascii=False, indent=2))
+
+        if options['keep']:
+            checkpoint["stats"] = stats
+            self.save_checkpoint(checkpoint_path, checkpoint)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        self.stdout.write(self.style.SUCCESS(f"重建完成，共 {merged} 条文档"))
+
+    def run_workers(self, using, model_label, pending, work_dir, checkpoint, checkpoint_path, options):
+        # 子进程各自建立数据库连接，fork 前关闭父进程的连接，避免共享同一个套接字
+        db_connections.close_all()
+        total = len(pending)
+        finished = 0
+        indexed = 0
+        with ProcessPoolExecutor(max_workers=max(options['workers'], 1), initializer=_init_worker) as pool:
+            futures = {
+                pool.submit(_index_chunk, using, model_label, lo, hi,
+                            os.path.join(work_dir, self.chunk_name(lo, hi)), options['batch_size']): (lo, hi)
+                for lo, hi in pending
+            }
+            for future in as_completed(futures):
+                lo, hi = futures[future]
+                try:
+                    docs, seconds = future.result()
+                except Exception as e:
+                    # 已完成的分段都记在检查点里，修复后加 --resume 继续
+                    raise CommandError(f"分段 {lo}-{hi} 失败：{e}；修复后使用 --resume 继续") from e
+                finished += 1
+                indexed += docs
+                checkpoint["done"][self.chunk_name(lo, hi)] = {"docs": docs, "seconds": round(seconds, 3)}
+                self.save_checkpoint(checkpoint_path, checkpoint)
+                rate = docs / seconds if seconds else 0
+                self.stdout.write(f"[{finished}/{total}] 主键 {lo}-{hi}：{docs} 条，{seconds:.1f} 秒，{rate:.0f} 条/秒")
+        return indexed
+
+    @staticmethod
+    def requeue_changes(model, index, backend, ranges, paths, started_at):
+        """
+        合并会先删除该模型的全部旧文档，再写入子进程按主键区间快照建立的文档。
+        快照之后 process_search_queue 已写入索引的新增、修改和删除会被合并覆盖，这里重新放回队列：
+        最后一个区间之后的主键、更新时间不早于开始时间的对象，以及子索引里有、数据库里已删除的对象。
+        索引没有声明更新时间字段（get_updated_field）的模型无法判断哪些对象变过，全部重新入队。
+        返回 (重新入队更新数, 重新入队删除数)
+        """
+        model_label = model._meta.label_lower
+        queryset = model._default_manager.all()
+        updated_field = index.get_updated_field()
+        if updated_field:
+            changed = Q(**{f"{updated_field}__gte": started_at})
+            if ranges:
+                changed |= Q(pk__gt=ranges[-1][1])
+            queryset = queryset.filter(changed)
+        updated = [str(pk) for pk in queryset.values_list('pk', flat=True)]
+        SearchIndexQueue.enqueue_many(model_label, updated, SearchIndexQueue.ACTION_UPDATE)
+
+        indexed = sorted(backend.subindex_object_ids(paths))
+        deleted = []
+        for i in range(0, len(indexed), REQUEUE_BATCH):
+            batch = indexed[i:i + REQUEUE_BATCH]
+            existing = {str(pk) for pk in model._default_manager.filter(pk__in=batch).values_list('pk', flat=True)}
+            deleted.extend(pk for pk in batch if pk not in existing)
+        SearchIndexQueue.enqueue_many(model_label, deleted, SearchIndexQueue.ACTION_DELETE)
+        return len(updated), len(deleted)
+
+    @staticmethod
+    def split_ranges(model, chunk_size):
+        """
+        按实际存在的主键切分，每段约 chunk_size 个对象，主键不连续时各段依然均匀。
+        区间端点存为字符串，UUID 主键的模型也能写入检查点，查询时由字段转换回原类型
+        """
+        pks = list(model._default_manager.order_by('pk').values_list('pk', flat=True))
+        return [[str(pks[i]), str(pks[min(i + chunk_size, len(pks)) - 1])] for i in range(0, len(pks), chunk_size)]
+
+    @staticmethod
+    def chunk_name(lo, hi):
+        return f"chunk_{lo}_{hi}"
+
+    def load_checkpoint(self, path, model_label):
+        try:
+            with open(path, encoding="utf-8") as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            self.stdout.write("没有可用的检查点，重新开始")
+            return None
+        if checkpoint.get("model") != model_label:
+            raise CommandError(f"检查点属于 {checkpoint.get('model')}，与 --model 不一致")
+        # 子索引目录丢失的分段需要重建
+        work_dir = os.path.dirname(path)
+        checkpoint["done"] = {
+            name: item for name, item in checkpoint.get("done", {}).items()
+            if os.path.isdir(os.path.join(work_dir, name))
+        }
+        return checkpoint
+
+    @staticmethod
+    def save_checkpoint(path, checkpoint):
+        # 先写临时文件再替换，中断时不会留下半个检查点
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
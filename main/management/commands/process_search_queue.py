@@ -0,0 +1,81 @@
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from haystack import connections
+from haystack.exceptions import NotHandled
+
+from main.models import SearchIndexQueue
+from main.related_articles import refresh_related
+
+
+class Command(BaseCommand):
+    help = "后台消费搜索索引更新队列，按批次写入Whoosh（同一时间只运行一个进程即可）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="每批最多处理的队列条数")
+        parser.add_argument('--interval', type=float, default=5.0, help="队列为空时的轮询间隔（秒）")
+        parser.add_argument('--once', action='store_true', help="清空当前队列后退出，适合定时任务调用")
+        parser.add_argument('--using', default='default', help="Haystack 连接名")
+
+    def handle(self, *args, **options):
+        self.using = options['using']
+        batch_size = options['batch_size']
+
+        while True:
+            processed = self.drain_batch(batch_size)
+            if processed:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+
+    def drain_batch(self, batch_size):
+        """处理一批队列，返回处理条数"""
+        # 只删除本批开始之前入队的记录；处理期间再次入队的对象会保留到下一批
+        started = timezone.now()
+        rows = list(SearchIndexQueue.objects.filter(queued_at__lte=started).order_by('queued_at')[:batch_size])
+        if not rows:
+            return 0
+
+        grouped = {}
+        for row in rows:
+            updates, deletes = grouped.setdefault(row.model_label, (set(), set()))
+            if row.action == SearchIndexQueue.ACTION_DELETE:
+                deletes.add(row.object_id)
+            else:
+                updates.add(row.object_id)
+
+        related_ids = set()
+        unified_index = connections[self.using].get_unified_index()
+        backend = connections[self.using].get_backend()
+        for model_label, (updates, deletes) in grouped.items():
+            try:
+                model = apps.get_model(model_label)
+                index = unified_index.get_index(model)
+            except (LookupError, NotHandled):
+                self.stderr.write(f"跳过未注册索引的模型：{model_label}")
+                continue
+
+            if updates:
+                objects = list(index.index_queryset(using=self.using).filter(pk__in=updates))
+                # 不在 index_queryset 里的对象（已删除或不应被索引）从索引中移除
+                found = {str(obj.pk) for obj in objects}
+                deletes |= updates - found
+                if objects:
+                    # 整批对象只打开一个写入器、提交一次
+                    backend.update(index, objects)
+                    if model_label == "main.articles":
+                        related_ids |= found
+            if deletes:
+                backend.remove_many([f"{model_label}.{pk}" for pk in deletes])
+
+        # 文章已写入索引，再刷新它们的相关阅读，more_like_this 能看到最新内容
+        if related_ids and getattr(settings, "RELATED_ARTICLES_ON_INDEX", True):
+            refresh_related(related_ids, using=self.using)
+
+        SearchIndexQueue.objects.filter(pk__in=[row.pk for row in rows], queued_at__lte=started).delete()
+        self.stdout.write(f"[{timezone.now():%Y-%m-%d %H:%M:%S}] 已写入索引 {len(rows)} 条")
+        return len(rows)
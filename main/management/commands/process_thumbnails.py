@@ -0,0 +1,40 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from main.thumbnails import process_batch
+
+
+class Command(BaseCommand):
+    help = "后台生成照片缩略图：按批领取待生成的照片，由进程池解码缩放，失败按指数退避重试"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1), help="进程池大小")
+        parser.add_argument('--batch-size', type=int, default=50, help="每批领取的照片数")
+        parser.add_argument('--interval', type=float, default=5.0, help="没有待生成照片时的轮询间隔（秒）")
+        parser.add_argument('--once', action='store_true', help="处理完当前到期的照片后退出，适合定时任务调用")
+
+    def handle(self, *args, **options):
+        executor = ProcessPoolExecutor(max_workers=options['workers'])
+        try:
+            while True:
+                try:
+                    counts = process_batch(executor, options['batch_size'])
+                except BrokenProcessPool:
+                    self.stderr.write("工作进程异常退出，重建进程池")
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = ProcessPoolExecutor(max_workers=options['workers'])
+                    continue
+                if counts:
+                    summary = "，".join(f"{status} {count}" for status, count in sorted(counts.items()))
+                    self.stdout.write(f"[{timezone.now():%Y-%m-%d %H:%M:%S}] 缩略图：{summary}")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        finally:
+            executor.shutdown()
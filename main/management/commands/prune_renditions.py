@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from main import renditions
+
+
+class Command(BaseCommand):
+    help = "照片版本缓存超过总大小上限时，按最近使用时间删除最久未用的文件"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-bytes', type=int, default=renditions.CACHE_MAX_BYTES,
+                            help="缓存总大小上限（字节），默认为 settings.RENDITION_CACHE_MAX_BYTES")
+        parser.add_argument('--dry-run', action='store_true', help="只统计要删除的文件，不实际删除")
+
+    def handle(self, *args, **options):
+        stats = renditions.prune(options['max_bytes'], dry_run=options['dry_run'])
+        self.stdout.write(
+            f"缓存 {stats['files']} 个文件，共 {stats['bytes'] / 1024 / 1024:.1f} MB；"
+            f"{'将删除' if options['dry_run'] else '已删除'} {stats['removed_files']} 个文件，"
+            f"{stats['removed_bytes'] / 1024 / 1024:.1f} MB"
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from main.models import Articles
+
+
+class Command(BaseCommand):
+    help = "根据点赞、收藏、评论表重新计算文章的冗余计数字段"
+
+    def add_arguments(self, parser):
+        parser.add_argument('article_ids', nargs='*', type=int, help="只重算指定的文章ID，默认全部")
+
+    def handle(self, *args, **options):
+        queryset = Articles.objects.all()
+        if options['article_ids']:
+            queryset = queryset.filter(pk__in=options['article_ids'])
+
+        # 单条UPDATE语句完成校准，不需要把文章逐条读进内存
+        updated = Articles.rebuild_counters(queryset)
+        self.stdout.write(self.style.SUCCESS(f"已重算 {updated} 篇文章的计数"))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import Articles
+from main.related_articles import refresh_related
+
+
+class Command(BaseCommand):
+    help = "重新计算文章的相关阅读列表；首次上线或调整权重后全量执行，平时可定时执行以更新别的文章列表中的旧条目"
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help="只刷新这些文章")
+        parser.add_argument('--all', action='store_true', help="刷新全部已审核文章")
+        parser.add_argument('--batch-size', type=int, default=200, help="每批处理的文章数")
+        parser.add_argument('--using', default='default', help="Haystack 连接名")
+
+    def handle(self, *args, **options):
+        if options['ids']:
+            ids = options['ids']
+        elif options['all']:
+            ids = list(Articles.objects.filter(state=Articles.APPROVED).order_by('pk').values_list('pk', flat=True))
+        else:
+            raise CommandError("请指定文章ID或使用 --all")
+
+        batch_size = max(1, options['batch_size'])
+        written = 0
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            written += refresh_related(batch, using=options['using'])
+            self.stdout.write(f"  {start + len(batch)}/{len(ids)} 篇")
+        self.stdout.write(self.style.SUCCESS(f"已刷新 {len(ids)} 篇文章的相关阅读，共 {written} 条"))
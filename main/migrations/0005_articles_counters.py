@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Articles = apps.get_model('main', 'Articles')
+    Like = apps.get_model('main', 'Like')
+    Collect = apps.get_model('main', 'Collect')
+    ArticleComments = apps.get_model('main', 'ArticleComments')
+
+    def count_of(model, **filters):
+        subquery = (model.objects.filter(article=OuterRef('pk'), **filters)
+                    .order_by().values('article').annotate(c=Count('pk')).values('c'))
+        return Coalesce(Subquery(subquery), 0)
+
+    Articles.objects.update(
+        like_count=count_of(Like),
+        collect_count=count_of(Collect),
+        comment_count=count_of(ArticleComments, is_deleted=False),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_articlecomments_parent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='articles',
+            name='collect_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='收藏数'),
+        ),
+        migrations.AddField(
+            model_name='articles',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='评论数'),
+        ),
+        migrations.AddField(
+            model_name='articles',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='点赞数'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_articles_counters'),
+        ('users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='articles',
+            index=models.Index(fields=['-created_articles'], name='main_articl_created_bbff26_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vaccinerecord',
+            index=models.Index(fields=['created_by', 'shot_date'], name='main_vaccin_created_f8eaf8_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='articles',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=160, verbose_name='摘要'),
+        ),
+        migrations.AddField(
+            model_name='articles',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='字数'),
+        ),
+    ]
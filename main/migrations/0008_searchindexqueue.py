@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:46
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_articles_excerpt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndexQueue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_label', models.CharField(max_length=100, verbose_name='模型')),
+                ('object_id', models.CharField(max_length=64, verbose_name='对象ID')),
+                ('action', models.CharField(choices=[('update', '更新'), ('delete', '删除')], default='update', max_length=10, verbose_name='操作')),
+                ('queued_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='入队时间')),
+            ],
+            options={
+                'verbose_name': '索引更新队列',
+                'verbose_name_plural': '索引更新队列',
+                'unique_together': {('model_label', 'object_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_searchindexqueue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedArticle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(default=0, verbose_name='得分')),
+                ('rank', models.PositiveSmallIntegerField(default=0, verbose_name='排序')),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='计算时间')),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='main.articles', verbose_name='文章')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.articles', verbose_name='相关文章')),
+            ],
+            options={
+                'verbose_name': '相关文章',
+                'verbose_name_plural': '相关文章',
+                'indexes': [models.Index(fields=['article', 'rank'], name='main_relate_article_159bd5_idx')],
+                'unique_together': {('article', 'related')},
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:05
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_existing_thumbnails(apps, schema_editor):
+    """已有缩略图的照片标记为已生成，视频标记为无需生成，其余保持待生成由后台补齐"""
+    Photo = apps.get_model('main', 'Photo')
+    Photo.objects.exclude(thumbnail__isnull=True).exclude(thumbnail="").update(thumbnail_status='done')
+    Photo.objects.exclude(media_type='photo').update(thumbnail_status='skipped')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_relatedarticle'),
+        ('users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='thumbnail_attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='缩略图生成次数'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='thumbnail_due_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='缩略图处理时间'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='thumbnail_error',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='缩略图错误'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='thumbnail_status',
+            field=models.CharField(choices=[('pending', '待生成'), ('processing', '生成中'), ('done', '已生成'), ('failed', '生成失败'), ('skipped', '无需生成')], default='pending', max_length=10, verbose_name='缩略图状态'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['thumbnail_status', 'thumbnail_due_at'], name='main_photo_thumbna_5f372f_idx'),
+        ),
+        migrations.RunPython(mark_existing_thumbnails, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_photo_thumbnail_status'),
+        ('users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['baby', '-shot_at', '-uploaded_at'], name='main_photo_baby_id_9699a2_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:12
+
+import django.db.models.deletion
+import django.utils.timezone
+import main.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_photo_shot_at_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='photo',
+            name='file',
+            field=models.FileField(storage=main.storage.get_media_storage, upload_to='baby_media/', verbose_name='文件'),
+        ),
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='SHA-256')),
+                ('name', models.CharField(max_length=255, verbose_name='存储路径')),
+                ('size', models.BigIntegerField(default=0, verbose_name='字节数')),
+                ('ref_count', models.IntegerField(default=0, verbose_name='引用数')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='创建时间')),
+                ('released_at', models.DateTimeField(blank=True, null=True, verbose_name='释放时间')),
+            ],
+            options={
+                'verbose_name': '媒体文件内容',
+                'verbose_name_plural': '媒体文件内容',
+                'indexes': [models.Index(fields=['ref_count', 'released_at'], name='main_mediab_ref_cou_43a8fb_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='blob',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='photos', to='main.mediablob', verbose_name='文件内容'),
+        ),
+    ]
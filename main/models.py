@@ -1,13 +1,19 @@
+import html
+import re
 import uuid
 
 from ckeditor.fields import RichTextField
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, connections, router, transaction, IntegrityError
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
 
+from main.storage import get_media_storage
 # from django.contrib.auth import get_user_model
 from users.models import Baby, User
 
@@ -101,6 +107,49 @@ class Record(models.Model):
         return f"{self.baby}的{self.get_category_display()}: {self.title or self.content[:20]}"
 
 
+class MediaBlob(models.Model):
+    """内容寻址存储中的一份文件：相同内容只存一份，ref_count 为引用它的照片数"""
+    # 内容的 SHA-256，同时是文件名
+    digest = models.CharField(verbose_name="SHA-256", max_length=64, primary_key=True)
+    name = models.CharField(verbose_name="存储路径", max_length=255)
+    size = models.BigIntegerField(verbose_name="字节数", default=0)
+    ref_count = models.IntegerField(verbose_name="引用数", default=0)
+    created_at = models.DateTimeField(verbose_name="创建时间", default=timezone.now)
+    # 引用数最近一次减少的时间；归零超过保留期后才允许清理
+    released_at = models.DateTimeField(verbose_name="释放时间", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "媒体文件内容"
+        verbose_name_plural = "媒体文件内容"
+        indexes = [
+            models.Index(fields=["ref_count", "released_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.digest[:12]} ×{self.ref_count}"
+
+    @classmethod
+    def acquire(cls, digest, name, size):
+        """
+        增加一次引用，不存在时创建。先做条件更新：更新持有行锁直到事务提交，
+        cleanup_media_blobs 锁定后删除的行在这里更新 0 行，随即重新创建，不会留下指向已删除行的照片
+        """
+        increment = {"ref_count": models.F("ref_count") + 1, "released_at": None}
+        with transaction.atomic():
+            if cls.objects.filter(pk=digest).update(**increment):
+                return
+            try:
+                with transaction.atomic():
+                    cls.objects.create(digest=digest, name=name, size=size, ref_count=1)
+            except IntegrityError:
+                # 并发上传了相同内容，行已由另一请求创建
+                cls.objects.filter(pk=digest).update(**increment)
+
+    @classmethod
+    def release(cls, digest):
+        cls.objects.filter(pk=digest).update(ref_count=models.F("ref_count") - 1, released_at=timezone.now())
+
+
 class Photo(models.Model):
     """照片/视频 - 管理宝宝的媒体文件，支持照片和视频两种类型"""
     # 媒体类型定义
@@ -121,17 +170,39 @@ class Photo(models.Model):
         null=True,
         blank=True
     )
-    # 媒体文件存储路径
-    file = models.FileField(verbose_name="文件", upload_to="baby_media/")
+    # 媒体文件存储路径：按内容寻址保存，相同内容的文件只存一份（见 main/storage.py）
+    file = models.FileField(verbose_name="文件", upload_to="baby_media/", storage=get_media_storage)
+    # 文件内容；旧的按上传文件名保存的文件为空
+    blob = models.ForeignKey(verbose_name="文件内容", to=MediaBlob, on_delete=models.PROTECT, related_name="photos",
+                             null=True, blank=True, editable=False)
     # 媒体类型：照片或视频
     media_type = models.CharField(verbose_name="媒体类型", max_length=10, choices=MEDIA_TYPE, default="photo")
     # 缩略图路径，用于快速预览
     thumbnail = models.ImageField(verbose_name="缩略图", upload_to="baby_media_thumb/", blank=True, null=True)
+    # 缩略图由后台 process_thumbnails 命令生成，上传请求只保存原图
+    THUMBNAIL_PENDING = "pending"
+    THUMBNAIL_PROCESSING = "processing"
+    THUMBNAIL_DONE = "done"
+    THUMBNAIL_FAILED = "failed"
+    THUMBNAIL_SKIPPED = "skipped"
+    THUMBNAIL_STATUS = (
+        (THUMBNAIL_PENDING, "待生成"),
+        (THUMBNAIL_PROCESSING, "生成中"),
+        (THUMBNAIL_DONE, "已生成"),
+        (THUMBNAIL_FAILED, "生成失败"),
+        (THUMBNAIL_SKIPPED, "无需生成"),
+    )
+    thumbnail_status = models.CharField(verbose_name="缩略图状态", max_length=10, choices=THUMBNAIL_STATUS,
+                                        default=THUMBNAIL_PENDING)
+    thumbnail_attempts = models.PositiveSmallIntegerField(verbose_name="缩略图生成次数", default=0)
+    thumbnail_error = models.CharField(verbose_name="缩略图错误", max_length=255, blank=True, default="")
+    # 待生成：最早可处理的时间（失败重试时向后推迟）；生成中：领取租约的到期时间
+    thumbnail_due_at = models.DateTimeField(verbose_name="缩略图处理时间", default=timezone.now)
     # 媒体描述
     description = models.CharField(verbose_name="描述", max_length=200, blank=True, null=True)
-    # 拍摄地点
+    # 拍摄地点：上传时从 EXIF GPS 读取，格式为“纬度,经度”
     location = models.CharField(verbose_name="拍摄地点", max_length=200, blank=True, null=True)
-    # 拍摄时间
+    # 拍摄时间：上传时从 EXIF DateTimeOriginal 读取
     shot_at = models.DateTimeField(verbose_name="拍摄时间", blank=True, null=True)
     # 上传者
     uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name="uploaded_media")
@@ -151,6 +222,12 @@ class Photo(models.Model):
         ordering = ["-shot_at", "-uploaded_at"]
         verbose_name = "照片/视频"
         verbose_name_plural = "照片/视频"
+        indexes = [
+            # 后台任务按状态和处理时间领取待生成缩略图的照片
+            models.Index(fields=["thumbnail_status", "thumbnail_due_at"]),
+            # 宝宝相册时间线：拍摄时间上传时从 EXIF 读取，与默认排序一致
+            models.Index(fields=["baby", "-shot_at", "-uploaded_at"]),
+        ]
 
     def __str__(self):
         return f"{self.get_media_type_display()}: {self.description or '未命名'}"
@@ -268,6 +345,10 @@ class VaccineRecord(models.Model):
         ordering = ["shot_date"]
         verbose_name = "接种记录"
         verbose_name_plural = "接种记录"
+        indexes = [
+            # 按录入者查看接种记录并按接种日期游标分页
+            models.Index(fields=["created_by", "shot_date"]),
+        ]
 
     def __str__(self):
         return f"{self.baby}接种{self.vaccine.name}: {self.shot_date}"
@@ -433,7 +514,14 @@ class Category(models.Model):
     classification_parent = models.ForeignKey(verbose_name="父类名",to="Category",null=True,blank=True,on_delete=models.CASCADE)
 
     def children(self):
-        return Category.objects.filter(classification_parent=self)
+        """直接子分类，取自进程内缓存的分类树，不再逐个节点查库"""
+        from main.category_tree import get_category_tree
+        return get_category_tree().children(self.id)
+
+    def descendant_ids(self):
+        """包含自身的全部后代分类ID"""
+        from main.category_tree import get_category_tree
+        return get_category_tree().descendant_ids(self.id)
 
 
     def __str__(self):
@@ -475,6 +563,65 @@ class Articles(models.Model):
 
     tags = models.ManyToManyField(verbose_name="所有标签", to=Tag)
 
+    # 互动计数（冗余字段）：由点赞/收藏/评论视图用F()原子增减，rebuild_article_counters命令可重新校准
+    like_count = models.PositiveIntegerField(verbose_name="点赞数", default=0)
+    collect_count = models.PositiveIntegerField(verbose_name="收藏数", default=0)
+    comment_count = models.PositiveIntegerField(verbose_name="评论数", default=0)
+
+    # 纯文本摘要和字数：保存时由富文本预先计算，列表页直接读取，不必加载整段HTML
+    excerpt = models.CharField(verbose_name="摘要", max_length=160, blank=True, editable=False)
+    word_count = models.PositiveIntegerField(verbose_name="字数", default=0, editable=False)
+
+    EXCERPT_LENGTH = 150
+    # 中文按字计数，英文和数字按词计数
+    WORD_RE = re.compile(r"[\u4e00-\u9fff]|[A-Za-z0-9]+")
+
+    COUNTER_FIELDS = ("like_count", "collect_count", "comment_count")
+
+    def plain_text(self):
+        """去掉HTML标签后的正文"""
+        # 还原 &nbsp; 等实体，模板输出时会重新转义
+        return html.unescape(strip_tags(self.content or ""))
+
+    def refresh_excerpt(self):
+        """根据富文本内容重新计算摘要和字数"""
+        plain_text = self.plain_text()
+        self.excerpt = Truncator(plain_text).chars(self.EXCERPT_LENGTH, truncate="...")
+        self.word_count = len(self.WORD_RE.findall(plain_text))
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "content" in update_fields:
+            self.refresh_excerpt()
+            if update_fields is not None:
+                kwargs["update_fields"] = set(update_fields) | {"excerpt", "word_count"}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def adjust_counter(cls, pk, field, delta):
+        """原子地调整计数字段，避免先读后写的竞争；减少时不会低于0"""
+        if field not in cls.COUNTER_FIELDS:
+            raise ValueError(f"未知的计数字段：{field}")
+        queryset = cls.objects.filter(pk=pk)
+        if delta < 0:
+            queryset = queryset.filter(**{f"{field}__gte": -delta})
+        return queryset.update(**{field: models.F(field) + delta})
+
+    @classmethod
+    def rebuild_counters(cls, queryset=None):
+        """用一条UPDATE + 相关子查询，从点赞/收藏/评论表重新校准计数"""
+        def count_of(model, **filters):
+            subquery = (model.objects.filter(article=models.OuterRef('pk'), **filters)
+                        .order_by().values('article').annotate(c=models.Count('pk')).values('c'))
+            return Coalesce(models.Subquery(subquery), 0)
+
+        if queryset is None:
+            queryset = cls.objects.all()
+        return queryset.update(
+            like_count=count_of(Like),
+            collect_count=count_of(Collect),
+            comment_count=count_of(ArticleComments, is_deleted=False),
+        )
 
     def get_absolute_url(self):
         return reverse('main:article_detail', kwargs={'pk': self.pk})
@@ -486,6 +633,10 @@ class Articles(models.Model):
         ordering = ["-created_articles"]
         verbose_name = "社区分享"
         verbose_name_plural = "社区分享"
+        indexes = [
+            # 社区列表按发表时间倒序游标分页
+            models.Index(fields=["-created_articles"]),
+        ]
 # 收藏
 class Collect(models.Model):
     user = models.ForeignKey(verbose_name="用户",to=User, on_delete=models.CASCADE)
@@ -577,4 +728,77 @@ class ArticleComments(models.Model):
             models.Index(fields=["article", "-create_time"]),
             # 复合索引：优化“按用户+时间”查询（高频场景：查某用户的所有评论并按时间排序）
             models.Index(fields=["user", "-create_time"]),
-        ]
\ No newline at end of file
+        ]
+
+
+# 搜索索引更新队列
+class SearchIndexQueue(models.Model):
+    """搜索索引待更新队列 - 保存/删除时只记录变更，由后台 process_search_queue 命令批量写入Whoosh"""
+    ACTION_UPDATE = "update"
+    ACTION_DELETE = "delete"
+    ACTION_CHOICES = (
+        (ACTION_UPDATE, "更新"),
+        (ACTION_DELETE, "删除"),
+    )
+    # 模型标识，如 main.articles
+    model_label = models.CharField(verbose_name="模型", max_length=100)
+    # 对象主键（兼容自增ID和UUID）
+    object_id = models.CharField(verbose_name="对象ID", max_length=64)
+    action = models.CharField(verbose_name="操作", max_length=10, choices=ACTION_CHOICES, default=ACTION_UPDATE)
+    # 最后一次入队时间；同一对象重复入队只更新这一行
+    queued_at = models.DateTimeField(verbose_name="入队时间", default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = "索引更新队列"
+        verbose_name_plural = "索引更新队列"
+        unique_together = [("model_label", "object_id")]
+
+    def __str__(self):
+        return f"{self.get_action_display()} {self.model_label}.{self.object_id}"
+
+    @classmethod
+    def enqueue(cls, model_label, object_id, action):
+        """入队；同一对象已在队列中时覆盖操作类型和时间，保证一个对象只处理一次"""
+        cls.enqueue_many(model_label, [object_id], action)
+
+    @classmethod
+    def enqueue_many(cls, model_label, object_ids, action):
+        """同一模型的多个对象一次入队"""
+        if not object_ids:
+            return
+        options = {"update_conflicts": True, "update_fields": ["action", "queued_at"]}
+        # MySQL 的 ON DUPLICATE KEY UPDATE 不能指定冲突字段，SQLite/PostgreSQL 则必须指定
+        if connections[router.db_for_write(cls)].features.supports_update_conflicts_with_target:
+            options["unique_fields"] = ["model_label", "object_id"]
+        now = timezone.now()
+        cls.objects.bulk_create(
+            [cls(model_label=model_label, object_id=pk, action=action, queued_at=now)
+             for pk in {str(pk) for pk in object_ids}],
+            **options
+        )
+
+
+
+# 相关文章
+class RelatedArticle(models.Model):
+    """
+    预先计算好的相关文章：每篇文章保留得分最高的若干篇，详情页按 (article, rank) 索引一次查出。
+    由 process_search_queue 在文章写入索引后刷新，也可用 refresh_related_articles 命令全量重算。
+    """
+    article = models.ForeignKey(verbose_name="文章", to=Articles, on_delete=models.CASCADE, related_name="related_links")
+    related = models.ForeignKey(verbose_name="相关文章", to=Articles, on_delete=models.CASCADE, related_name="+")
+    # 综合得分：正文相似度 + 共同标签/分类
+    score = models.FloatField(verbose_name="得分", default=0)
+    rank = models.PositiveSmallIntegerField(verbose_name="排序", default=0)
+    computed_at = models.DateTimeField(verbose_name="计算时间", default=timezone.now)
+
+    class Meta:
+        verbose_name = "相关文章"
+        verbose_name_plural = "相关文章"
+        unique_together = [("article", "related")]
+        indexes = [
+            models.Index(fields=["article", "rank"]),
+        ]
+
+    def __str__(self):
+        return f"{self.article_id} -> {self.related_id} ({self.score:.3f})"
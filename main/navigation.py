@@ -0,0 +1,74 @@
+"""
+页头导航数据（分类树、标签列表）的进程级缓存
+
+header.html 每次渲染都要取分类和标签。这些数据很少变化，这里在进程内存中保留一份，
+并用缓存中的版本号判断是否过期：分类或标签保存/删除时版本号+1（见 signals.py），
+各进程下次读取时发现版本变化才重新加载。稳定状态下渲染页头不产生数据库查询。
+
+版本号存放在 settings.NAV_CACHE_ALIAS 指定的缓存中；多进程部署需要使用进程间共享的缓存后端
+（如文件缓存），否则其它进程要等 NAV_MAX_AGE 秒后才会重新加载。
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from main.category_tree import CategoryTree
+from main.models import Category, Tag
+
+NAV_CACHE_ALIAS = getattr(settings, "NAV_CACHE_ALIAS", "default")
+# 兜底的最长缓存时间（秒），防止版本号无法跨进程同步时数据长期不更新
+NAV_MAX_AGE = getattr(settings, "NAV_MAX_AGE", 600)
+VERSION_KEY = "nav:version"
+
+_lock = threading.Lock()
+_state = {"version": None, "loaded_at": 0.0, "data": None}
+
+
+class NavigationData:
+    """导航数据快照，只读"""
+
+    def __init__(self, category_tree, tags):
+        self.category_tree = category_tree
+        # 全部分类，按ID排序
+        self.all_categories = category_tree.categories
+        # 顶级分类，每个分类的 child_list 属性是其子分类列表
+        self.root_categories = category_tree.roots
+        self.tags = tags
+
+
+def _load():
+    return NavigationData(CategoryTree(Category.objects.all()), list(Tag.objects.order_by("id")))
+
+
+def get_version():
+    cache = caches[NAV_CACHE_ALIAS]
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_version():
+    cache = caches[NAV_CACHE_ALIAS]
+    cache.add(VERSION_KEY, 1, None)
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+
+
+def get_navigation():
+    """返回当前的导航数据，版本未变化时直接使用进程内的快照"""
+    version = get_version()
+    state = _state
+    if state["version"] == version and time.monotonic() - state["loaded_at"] < NAV_MAX_AGE:
+        return state["data"]
+    with _lock:
+        # 双重检查：等锁期间可能已被其它线程加载
+        if _state["version"] != version or time.monotonic() - _state["loaded_at"] >= NAV_MAX_AGE:
+            data = _load()
+            _state.update(version=version, loaded_at=time.monotonic(), data=data)
+        return _state["data"]
@@ -0,0 +1,159 @@
+"""
+游标（keyset）分页
+
+Django 自带的 Paginator 每页都要先 COUNT(*)，再用越来越大的 OFFSET 扫描，
+页码越深越慢。这里改用上一页最后一条记录的排序键作为游标：
+    WHERE (created, id) < (上一页末尾的 created, id) ORDER BY created DESC, id DESC LIMIT n+1
+配合排序字段上的索引，第1000页和第1页的代价相同，也不需要 COUNT。
+"""
+import base64
+import json
+import uuid
+from datetime import date, datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """一页数据；接口尽量贴近 django.core.paginator.Page，方便模板沿用 page_obj"""
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    按固定排序字段做游标分页
+    :param queryset: 待分页的查询集
+    :param ordering: 排序字段，如 ("-created_at", "-id")；最后一个字段必须唯一，保证排序稳定
+    :param per_page: 每页条数
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.fields = [
+            (name.lstrip("-"), name.startswith("-")) for name in self.ordering
+        ]
+
+    # ---- 游标编解码 ----
+    @staticmethod
+    def _dump_value(value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, uuid.UUID):
+            return str(value)
+        return value
+
+    def encode_cursor(self, obj, direction):
+        """direction: 'n' 表示从 obj 之后取下一页，'p' 表示取 obj 之前的上一页"""
+        values = [self._dump_value(getattr(obj, name)) for name, _ in self.fields]
+        raw = json.dumps([direction, values], separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        except (ValueError, TypeError, UnicodeError):
+            raise InvalidCursor(cursor)
+        if direction not in ("n", "p") or len(values) != len(self.fields):
+            raise InvalidCursor(cursor)
+        opts = self.queryset.model._meta
+        try:
+            # 借助模型字段把字符串还原成日期、UUID等原生类型
+            values = [opts.get_field(name).to_python(value) for (name, _), value in zip(self.fields, values)]
+        except Exception:
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    # ---- 查询构造 ----
+    def _seek_filter(self, values, forward):
+        """
+        构造 (f1, f2, ...) 越过 values 的条件：
+        f1 越过 v1 OR (f1 = v1 AND f2 越过 v2) OR ...
+        forward=True 表示沿排序方向向后，False 表示反向
+        """
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.fields, values):
+            lookup = "lt" if descending == forward else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def page(self, cursor=None):
+        direction, values = ("n", None)
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+
+        queryset = self.queryset
+        forward = direction == "n"
+        if values is not None:
+            queryset = queryset.filter(self._seek_filter(values, forward))
+
+        if forward:
+            queryset = queryset.order_by(*self.ordering)
+        else:
+            # 向前翻页时反向排序取数，再在内存中翻转回来
+            reversed_ordering = [name[1:] if name.startswith("-") else "-" + name for name in self.ordering]
+            queryset = queryset.order_by(*reversed_ordering)
+
+        # 多取一条判断是否还有更多
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        if not rows:
+            return KeysetPage(rows, None, None)
+
+        if forward:
+            has_next, has_previous = has_more, values is not None
+        else:
+            has_next, has_previous = True, has_more
+
+        next_cursor = self.encode_cursor(rows[-1], "n") if has_next else None
+        previous_cursor = self.encode_cursor(rows[0], "p") if has_previous else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+class KeysetPaginationMixin:
+    """
+    ListView 的游标分页混入类，替代 paginate_by 的 OFFSET 分页
+    子类设置 keyset_ordering；模板中用 page_obj.next_cursor / page_obj.previous_cursor 翻页
+    """
+    keyset_ordering = ("-pk",)
+    cursor_kwarg = "cursor"
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, self.keyset_ordering, page_size)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            # 游标被篡改或已失效时回到第一页
+            page = paginator.page()
+        return paginator, page, page.object_list, page.has_other_pages()
@@ -0,0 +1,116 @@
+"""
+照片 EXIF 信息
+
+上传时（Photo 的 pre_save）和 backfill_exif 命令从照片文件头读取 EXIF：
+拍摄时间 DateTimeOriginal、方向 Orientation、GPS 经纬度。Image.open 只解析文件头，不解码像素，
+一张照片只读取几十 KB。拍摄时间和地点写入 Photo.shot_at / Photo.location（已有值不覆盖），
+方向在生成缩略图和各尺寸版本时使用（见 image_io.open_image）。
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+from PIL import ExifTags, Image
+
+TAG_ORIENTATION = 0x0112
+TAG_DATETIME = 0x0132
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_OFFSET_TIME_ORIGINAL = 0x9011
+GPS_LATITUDE_REF = 1
+GPS_LATITUDE = 2
+GPS_LONGITUDE_REF = 3
+GPS_LONGITUDE = 4
+
+# 需要转 90 度的方向：宽高互换
+ROTATED_ORIENTATIONS = (5, 6, 7, 8)
+# EXIF 方向 -> 旋转到正向所需的变换
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+def parse_datetime(value, offset=None):
+    """'2024:05:01 08:30:00' (+ '+08:00') -> 带时区的 datetime；没有时区偏移时按当前时区理解"""
+    if not value:
+        return None
+    try:
+        naive = datetime.strptime(str(value).strip("\x00 ")[:19], "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+    if offset:
+        try:
+            sign = -1 if offset.startswith("-") else 1
+            hours, minutes = offset.lstrip("+-").split(":")
+            tz = dt_timezone(sign * timedelta(hours=int(hours), minutes=int(minutes)))
+            return naive.replace(tzinfo=tz)
+        except ValueError:
+            pass
+    return timezone.make_aware(naive) if timezone.is_naive(naive) else naive
+
+
+def _degrees(value, ref):
+    try:
+        degrees, minutes, seconds = (float(v) for v in value)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    result = degrees + minutes / 60 + seconds / 3600
+    return -result if ref in ("S", "W") else result
+
+
+def parse_gps(gps):
+    """GPS IFD -> '纬度,经度'（保留 6 位小数）"""
+    if not gps:
+        return None
+    latitude = _degrees(gps.get(GPS_LATITUDE), gps.get(GPS_LATITUDE_REF))
+    longitude = _degrees(gps.get(GPS_LONGITUDE), gps.get(GPS_LONGITUDE_REF))
+    if latitude is None or longitude is None or (latitude == 0 and longitude == 0):
+        return None
+    return f"{latitude:.6f},{longitude:.6f}"
+
+
+def read_exif(img):
+    """从已打开（未解码）的图片读取 {"shot_at", "location", "orientation", "size"}"""
+    exif = img.getexif()
+    exif_ifd = exif.get_ifd(ExifTags.IFD.Exif)
+    shot_at = parse_datetime(
+        exif_ifd.get(TAG_DATETIME_ORIGINAL) or exif.get(TAG_DATETIME),
+        exif_ifd.get(TAG_OFFSET_TIME_ORIGINAL),
+    )
+    return {
+        "shot_at": shot_at,
+        "location": parse_gps(exif.get_ifd(ExifTags.IFD.GPSInfo)),
+        "orientation": exif.get(TAG_ORIENTATION) or 1,
+        "size": img.size,
+    }
+
+
+def read_metadata(fp):
+    """fp 为文件路径或文件对象；文件对象读完后回到开头。读取失败返回 None"""
+    position = fp.tell() if hasattr(fp, "tell") else None
+    try:
+        with Image.open(fp) as img:
+            return read_exif(img)
+    except Exception:
+        return None
+    finally:
+        if position is not None:
+            fp.seek(position)
+
+
+def apply_metadata(photo, metadata):
+    """把读取到的拍摄时间和地点填到空字段上，返回被修改的字段名"""
+    changed = []
+    if not metadata:
+        return changed
+    if photo.shot_at is None and metadata["shot_at"] is not None:
+        photo.shot_at = metadata["shot_at"]
+        changed.append("shot_at")
+    if not photo.location and metadata["location"]:
+        photo.location = metadata["location"]
+        changed.append("location")
+    return changed
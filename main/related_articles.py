@@ -0,0 +1,105 @@
+"""
+相关阅读
+
+详情页原来每次打开都要对 Whoosh 做一次 more_like_this（定位文档、提取关键词、再做一次带过滤的全文检索），
+现在改为后台预先计算，结果存在 RelatedArticle 表里，详情页只按 (article, rank) 索引查一次。
+
+每篇文章的候选来自两部分：
+- 正文相似：Whoosh more_like_this 的结果，得分按本篇的最高分归一化到 0~1；
+- 共同标签/分类：通过多对多中间表统计与本篇共享的标签数、分类数。
+两部分加权求和后保留前 RELATED_TOP_K 篇。只有审核通过的文章才会出现在相关列表中。
+
+文章写入索引后由 process_search_queue 刷新它自己的列表；别的文章列表里引用到它的条目
+会在下次全量刷新（refresh_related_articles 命令）时更新，文章删除时由外键级联删除。
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from haystack import connections
+
+from main.models import Articles, RelatedArticle
+
+RELATED_TOP_K = getattr(settings, "RELATED_ARTICLES_TOP_K", 6)
+# 每个来源最多取的候选数
+CANDIDATE_LIMIT = RELATED_TOP_K * 3
+# 每共享一个标签/分类加的分，正文相似度最高为 1
+TAG_WEIGHT = 0.3
+CATEGORY_WEIGHT = 0.2
+
+
+def _text_scores(backend, article):
+    """正文相似度：more_like_this 得分归一化"""
+    results = backend.more_like_this(
+        article,
+        additional_query_string=f"state:{Articles.APPROVED}",
+        end_offset=CANDIDATE_LIMIT,
+        models=[Articles],
+    ).get("results", [])
+    top = max((r.score or 0 for r in results), default=0)
+    if not top:
+        return {}
+    return {int(r.pk): (r.score or 0) / top for r in results}
+
+
+def _shared_counts(through, field, article_id):
+    """通过多对多中间表统计与本篇共享 field 的已审核文章及共享个数"""
+    own = through.objects.filter(articles_id=article_id).values_list(field, flat=True)
+    rows = (
+        through.objects
+        .filter(**{f"{field}__in": own}, articles__state=Articles.APPROVED)
+        .exclude(articles_id=article_id)
+        .values("articles_id")
+        .annotate(n=Count(field))
+        .order_by("-n")[:CANDIDATE_LIMIT]
+    )
+    return {row["articles_id"]: row["n"] for row in rows}
+
+
+def compute_related(article, backend):
+    """返回 [(related_id, score), ...]，按得分从高到低，最多 RELATED_TOP_K 条"""
+    scores = _text_scores(backend, article)
+    for through, field, weight in (
+        (Articles.tags.through, "tag_id", TAG_WEIGHT),
+        (Articles.categorys.through, "category_id", CATEGORY_WEIGHT),
+    ):
+        for related_id, shared in _shared_counts(through, field, article.pk).items():
+            scores[related_id] = scores.get(related_id, 0) + shared * weight
+    scores.pop(article.pk, None)
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+    return ranked[:RELATED_TOP_K]
+
+
+def refresh_related(article_ids, using="default"):
+    """重新计算这些文章的相关列表并整批替换，返回写入的行数"""
+    backend = connections[using].get_backend()
+    articles = Articles.objects.filter(pk__in=list(article_ids)).only("pk", "state")
+    now = timezone.now()
+    rows = []
+    for article in articles:
+        # 未审核的文章详情页不对外展示，不必计算
+        if article.state != Articles.APPROVED:
+            continue
+        rows.extend(
+            RelatedArticle(article_id=article.pk, related_id=related_id, score=score, rank=rank, computed_at=now)
+            for rank, (related_id, score) in enumerate(compute_related(article, backend))
+        )
+    # 候选可能在计算期间被删除，写入前再过滤一次，避免外键错误
+    existing = set(Articles.objects.filter(pk__in={row.related_id for row in rows}).values_list("pk", flat=True))
+    rows = [row for row in rows if row.related_id in existing]
+    with transaction.atomic():
+        RelatedArticle.objects.filter(article_id__in=list(article_ids)).delete()
+        RelatedArticle.objects.bulk_create(rows)
+    return len(rows)
+
+
+def get_related(article):
+    """详情页用：一次查询取出已审核的相关文章"""
+    links = (
+        RelatedArticle.objects
+        .filter(article=article, related__state=Articles.APPROVED)
+        .select_related("related")
+        .defer("related__content")
+        .order_by("rank")
+    )
+    return [link.related for link in links]
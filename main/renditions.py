@@ -0,0 +1,179 @@
+"""
+照片多尺寸版本（rendition）
+
+页面不再直接引用原图或单一的 300px 缩略图，而是按用途取命名尺寸：
+头像 avatar、网格 grid（方形裁切），卡片 card、大图 lightbox（等比缩放）。每个尺寸有 1x/2x 两个宽度，
+模板通过 {% photo_img %} 输出 srcset，由浏览器按屏幕宽度和像素密度挑选。
+
+版本在第一次被请求时生成（photo_rendition 视图），保存在 RENDITION_CACHE_DIR 下，
+文件名由原图的存储路径、大小、修改时间和尺寸参数计算，原图变化或参数调整后自然换成新文件。
+缓存按总字节数淘汰：命中时更新文件修改时间，超过 RENDITION_CACHE_MAX_BYTES 时删除最久未用的文件，
+生成一定数量后在后台线程检查一次，也可以用 prune_renditions 命令定时清理。
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+from main.image_io import open_image
+
+Rendition = namedtuple("Rendition", ["widths", "crop", "sizes"])
+
+RENDITIONS = {
+    "avatar": Rendition(widths=(48, 96), crop=True, sizes="48px"),
+    "grid": Rendition(widths=(160, 320), crop=True, sizes="(max-width: 600px) 33vw, 160px"),
+    "card": Rendition(widths=(320, 640), crop=False, sizes="(max-width: 600px) 100vw, 320px"),
+    "lightbox": Rendition(widths=(1024, 2048), crop=False, sizes="100vw"),
+}
+# 生成参数变化（质量、算法）时改这个版本号，旧文件不再命中，由淘汰逐步清理
+RENDITION_VERSION = 3
+JPEG_QUALITY = 82
+
+CACHE_DIR = str(getattr(settings, "RENDITION_CACHE_DIR", os.path.join(settings.BASE_DIR, "cache", "renditions")))
+CACHE_MAX_BYTES = getattr(settings, "RENDITION_CACHE_MAX_BYTES", 2 * 1024 ** 3)
+# 淘汰时删到上限的这个比例，避免每生成一张就清理一次
+PRUNE_LOW_WATERMARK = 0.9
+# 每生成多少个文件检查一次总大小
+PRUNE_EVERY = 200
+# 命中时距上次更新修改时间超过这么久才再更新，减少磁盘元数据写入
+TOUCH_INTERVAL = 3600
+
+
+def is_valid(name, width):
+    rendition = RENDITIONS.get(name)
+    return rendition is not None and width in rendition.widths
+
+
+def cache_key(file_name, size, mtime_ns, name, width):
+    spec = f"{RENDITION_VERSION}:{name}:{width}:{RENDITIONS[name].crop}:{JPEG_QUALITY}"
+    return hashlib.sha1(f"{file_name}:{size}:{mtime_ns}:{spec}".encode("utf-8")).hexdigest()
+
+
+def cache_path(key):
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.jpg")
+
+
+def render(source_path, target_path, width, crop):
+    """
+    把原图缩放为指定宽度的 JPEG；不放大，方形裁切时边长不超过原图短边。
+    等比缩放只限制宽度（竖图高度可以超过 width），与 srcset 中声明的宽度一致
+    """
+    tmp_path = f"{target_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    try:
+        # 按目标宽度缩小解码，原图再大也只解出目标尺寸几倍的像素（见 image_io.py）
+        with open_image(source_path, width) as img:
+            if crop:
+                side = min(width, *img.size)
+                img = ImageOps.fit(img, (side, side), Image.Resampling.LANCZOS)
+            else:
+                # 高度上限取原高度，等于只按宽度缩放
+                img.thumbnail((width, img.size[1]), Image.Resampling.LANCZOS)
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            img.save(tmp_path, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        os.replace(tmp_path, target_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+_generated = 0
+_generated_lock = threading.Lock()
+_prune_lock = threading.Lock()
+
+
+def get_rendition(photo, name, width):
+    """返回版本文件的路径，缓存中没有时当场生成"""
+    source_path = photo.file.path
+    stat = os.stat(source_path)
+    path = cache_path(cache_key(photo.file.name, stat.st_size, stat.st_mtime_ns, name, width))
+    try:
+        mtime = os.stat(path).st_mtime
+    except FileNotFoundError:
+        render(source_path, path, width, RENDITIONS[name].crop)
+        _after_generate()
+        return path
+    if time.time() - mtime > TOUCH_INTERVAL:
+        # 修改时间用作最近使用时间，淘汰时先删最久未用的
+        os.utime(path)
+    return path
+
+
+def open_rendition(photo, name, width):
+    """打开版本文件；取得路径后文件恰好被淘汰（后台线程或 prune_renditions）时重新生成一次"""
+    path = get_rendition(photo, name, width)
+    try:
+        return open(path, "rb")
+    except FileNotFoundError:
+        return open(get_rendition(photo, name, width), "rb")
+
+
+def _after_generate():
+    global _generated
+    with _generated_lock:
+        _generated += 1
+        due = _generated % PRUNE_EVERY == 0
+    if due and _prune_lock.acquire(blocking=False):
+        def run():
+            try:
+                prune()
+            finally:
+                _prune_lock.release()
+        threading.Thread(target=run, name="rendition-prune", daemon=True).start()
+
+
+def cache_files():
+    """[(最近使用时间, 字节数, 路径), ...]"""
+    files = []
+    if not os.path.isdir(CACHE_DIR):
+        return files
+    for entry in os.scandir(CACHE_DIR):
+        if not entry.is_dir():
+            continue
+        for file in os.scandir(entry.path):
+            if file.name.endswith(".jpg"):
+                stat = file.stat()
+                files.append((stat.st_mtime, stat.st_size, file.path))
+    return files
+
+
+def prune(max_bytes=None, dry_run=False):
+    """总字节数超过上限时按最近使用时间从旧到新删除，返回统计"""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    files = cache_files()
+    total = sum(size for _, size, _ in files)
+    stats = {"files": len(files), "bytes": total, "removed_files": 0, "removed_bytes": 0}
+    if total <= max_bytes:
+        return stats
+    target = max_bytes * PRUNE_LOW_WATERMARK
+    for _, size, path in sorted(files):
+        if total <= target:
+            break
+        if not dry_run:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        total -= size
+        stats["removed_files"] += 1
+        stats["removed_bytes"] += size
+    return stats
+
+
+def rendition_url(photo, name, width):
+    # 原图路径不变时 URL 不变，浏览器可长期缓存；换了文件自然换 URL
+    version = hashlib.sha1(photo.file.name.encode("utf-8")).hexdigest()[:10]
+    return f"{reverse('main:photo_rendition', args=[photo.pk, name, width])}?v={version}"
+
+
+def srcset(photo, name):
+    """(src, srcset, sizes)：src 用 1x 宽度，srcset 列出该尺寸的全部宽度"""
+    rendition = RENDITIONS[name]
+    urls = [(width, rendition_url(photo, name, width)) for width in rendition.widths]
+    return urls[0][1], ", ".join(f"{url} {width}w" for width, url in urls), rendition.sizes
@@ -1,11 +1,157 @@
+from django.utils import timezone
 from haystack import indexes
-from .models import Articles
+
+from .category_tree import CategoryTree
+from .models import Articles, Category, CheckupRecord, Event, MedicationRecord, Record, VaccineRecord
+
+# 高亮摘要字段保存的纯文本长度
+SNIPPET_LENGTH = 1000
+
+
+class SnippetField(indexes.CharField):
+    """高亮摘要字段：后端按 field_type 建成保存字符位置的 TEXT 字段，高亮时不必重新分词"""
+    field_type = "snippet"
+
 
 class ArticlesIndex(indexes.SearchIndex, indexes.Indexable):
+    # 主字段：标题 + 去掉HTML后的正文 + 标签 + 分类，/search/ 默认检索这个字段
     text = indexes.CharField(document=True, use_template=True)
+    # 单独建索引并加权的字段：命中标题、标签、分类的文章排在只命中正文的前面
+    title = indexes.CharField(model_attr='title', boost=3.0)
+    tags = indexes.CharField(boost=2.0)
+    categories = indexes.CharField(boost=1.5)
+    # 只用于过滤/排序；用户主键是UUID，存成不分词的关键字字段，按原值精确匹配
+    author = indexes.MultiValueField()
+    state = indexes.IntegerField(model_attr='state')
+    created = indexes.DateTimeField(model_attr='created_articles')
+    # 分面字段（不分词的关键字）：分类ID含全部上级分类，筛选父分类时自然包含子分类的文章
+    category_ids = indexes.MultiValueField()
+    tag_ids = indexes.MultiValueField()
+    # 发表月份，本地时间，如 2025-10
+    month = indexes.MultiValueField()
+    # 高亮摘要：正文纯文本的前 SNIPPET_LENGTH 个字符，搜索结果页只对它做高亮
+    snippet = SnippetField(indexed=True, stored=True)
 
     def get_model(self):
         return Articles
 
+    def get_updated_field(self):
+        return "updated_articles"
+
     def index_queryset(self, using=None):
-        return self.get_model().objects.all()
\ No newline at end of file
+        # 标签、分类一并预取，批量建索引时不再逐篇查询
+        return self.get_model().objects.prefetch_related('tags', 'categorys')
+
+    def prepare_snippet(self, obj):
+        return obj.plain_text()[:SNIPPET_LENGTH]
+
+    def prepare_author(self, obj):
+        return [str(obj.author_id)] if obj.author_id else []
+
+    def prepare_category_ids(self, obj):
+        # 写进索引的上级分类ID会一直保留，不能用各进程按版本号缓存的导航分类树：
+        # 版本号存在进程内缓存里，后台 process_search_queue 看不到网站进程的更新。
+        # 每篇文章从数据库取一次（只有ID和上级ID两列），分类移动后重建的文档一定是新的上级关系
+        tree = CategoryTree(Category.objects.only("id", "classification_parent_id"))
+        ids = set()
+        for category in obj.categorys.all():
+            ids.add(category.id)
+            ids.update(parent.id for parent in tree.ancestors(category.id))
+        return [str(pk) for pk in sorted(ids)]
+
+    def prepare_tag_ids(self, obj):
+        return [str(tag.id) for tag in obj.tags.all()]
+
+    def prepare_month(self, obj):
+        return [timezone.localtime(obj.created_articles).strftime("%Y-%m")]
+
+    def prepare_tags(self, obj):
+        return " ".join(tag.tag for tag in obj.tags.all())
+
+    def prepare_categories(self, obj):
+        return " ".join(category.classification for category in obj.categorys.all())
+
+
+class FamilyIndex(indexes.SearchIndex):
+    """
+    家庭私有记录的索引基类。baby_id 存成不分词的关键字（UUID去掉连字符），
+    查询时只按当前用户在 BabyParent 中关联的宝宝过滤，见 views.family_search。
+    标题和日期存储在索引中，结果列表直接展示，不回表。
+    """
+    text = indexes.CharField(document=True, use_template=True)
+    baby_id = indexes.MultiValueField()
+    family_title = indexes.CharField()
+    family_date = indexes.DateField()
+
+    def prepare_baby_id(self, obj):
+        return [obj.baby_id.hex]
+
+
+class RecordIndex(FamilyIndex, indexes.Indexable):
+    def get_model(self):
+        return Record
+
+    def prepare_family_title(self, obj):
+        return obj.title
+
+    def prepare_family_date(self, obj):
+        return obj.record_date
+
+
+class EventIndex(FamilyIndex, indexes.Indexable):
+    def get_model(self):
+        return Event
+
+    def get_updated_field(self):
+        return "updated_at"
+
+    def index_queryset(self, using=None):
+        return self.get_model().objects.select_related('type')
+
+    def prepare_family_title(self, obj):
+        return obj.title
+
+    def prepare_family_date(self, obj):
+        return obj.happen_date
+
+
+class MedicationRecordIndex(FamilyIndex, indexes.Indexable):
+    def get_model(self):
+        return MedicationRecord
+
+    def prepare_family_title(self, obj):
+        return f"用药：{obj.medicine_name}（{obj.disease}）" if obj.disease else f"用药：{obj.medicine_name}"
+
+    def prepare_family_date(self, obj):
+        return timezone.localtime(obj.administration_time).date()
+
+
+class CheckupRecordIndex(FamilyIndex, indexes.Indexable):
+    def get_model(self):
+        return CheckupRecord
+
+    def get_updated_field(self):
+        return "updated_at"
+
+    def prepare_family_title(self, obj):
+        return f"体检：{obj.institution}"
+
+    def prepare_family_date(self, obj):
+        return obj.checkup_date
+
+
+class VaccineRecordIndex(FamilyIndex, indexes.Indexable):
+    def get_model(self):
+        return VaccineRecord
+
+    def get_updated_field(self):
+        return "updated_at"
+
+    def index_queryset(self, using=None):
+        return self.get_model().objects.select_related('vaccine')
+
+    def prepare_family_title(self, obj):
+        return f"接种：{obj.vaccine.name}"
+
+    def prepare_family_date(self, obj):
+        return obj.shot_date
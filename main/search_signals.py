@@ -0,0 +1,95 @@
+"""
+排队式的 Haystack 信号处理器
+
+RealtimeSignalProcessor 在保存文章的请求里同步写 Whoosh：刷新索引、打开写入器、提交并等待，
+多个进程同时写还会争抢写锁。这里改为只把变更的对象写入 SearchIndexQueue 表
+（与业务数据在同一事务中，不会丢失），由后台 process_search_queue 命令批量取出，
+一次提交写入索引。
+
+文章的索引文档里包含标签、分类的名称和ID，所以标签、分类改名、移动或删除时，相关文章也要重新入队。
+"""
+from django.db import models
+from haystack.signals import BaseSignalProcessor
+
+from main.models import Articles, Category, SearchIndexQueue, Tag
+
+
+class QueuedSignalProcessor(BaseSignalProcessor):
+    def setup(self):
+        models.signals.post_save.connect(self.handle_save)
+        models.signals.post_delete.connect(self.handle_delete)
+        # 标签、分类等多对多关系在 post_save 之后才写入，也需要重新索引
+        models.signals.m2m_changed.connect(self.handle_m2m_changed)
+        # 删除时关联行会被级联删除，要在删除前取出相关文章
+        models.signals.pre_delete.connect(self.handle_related_delete)
+
+    def teardown(self):
+        models.signals.post_save.disconnect(self.handle_save)
+        models.signals.post_delete.disconnect(self.handle_delete)
+        models.signals.m2m_changed.disconnect(self.handle_m2m_changed)
+        models.signals.pre_delete.disconnect(self.handle_related_delete)
+
+    def is_indexed(self, model):
+        for using in self.connection_router.for_write():
+            if model in self.connections[using].get_unified_index().get_indexed_models():
+                return True
+        return False
+
+    def handle_save(self, sender, instance, created=False, **kwargs):
+        if self.is_indexed(sender):
+            SearchIndexQueue.enqueue(sender._meta.label_lower, instance.pk, SearchIndexQueue.ACTION_UPDATE)
+        elif not created:
+            self.enqueue_related_articles(sender, instance)
+
+    def handle_related_delete(self, sender, instance, **kwargs):
+        self.enqueue_related_articles(sender, instance)
+
+    def enqueue_related_articles(self, sender, instance):
+        if sender is Tag:
+            queryset = Articles.objects.filter(tags=instance)
+        elif sender is Category:
+            # 文章索引里的分类ID包含全部上级分类，改名或移动分类时整棵子树的文章都要重建
+            from main.category_tree import get_category_tree
+            category_ids = get_category_tree().descendant_ids(instance.pk) or {instance.pk}
+            queryset = Articles.objects.filter(categorys__in=category_ids).distinct()
+        else:
+            return
+        if self.is_indexed(Articles):
+            SearchIndexQueue.enqueue_many(
+                Articles._meta.label_lower, list(queryset.values_list('pk', flat=True)), SearchIndexQueue.ACTION_UPDATE
+            )
+
+    def handle_delete(self, sender, instance, **kwargs):
+        if self.is_indexed(sender):
+            SearchIndexQueue.enqueue(sender._meta.label_lower, instance.pk, SearchIndexQueue.ACTION_DELETE)
+
+    def handle_m2m_changed(self, sender, instance, action, reverse, model, pk_set=None, **kwargs):
+        if not reverse:
+            if action in ("post_add", "post_remove", "post_clear") and self.is_indexed(type(instance)):
+                SearchIndexQueue.enqueue(instance._meta.label_lower, instance.pk, SearchIndexQueue.ACTION_UPDATE)
+            return
+        # 从另一端修改（tag.articles_set.add(文章)、分类一侧的 add/remove/clear）：受影响的是 model 一侧的对象
+        if not self.is_indexed(model):
+            return
+        if action == "pre_clear":
+            # clear 之后关联行已删除，先记下受影响的对象
+            instance._search_cleared_ids = self.related_ids(sender, instance, model)
+            return
+        if action in ("post_add", "post_remove"):
+            ids = list(pk_set or ())
+        elif action == "post_clear":
+            ids = instance.__dict__.pop("_search_cleared_ids", [])
+        else:
+            return
+        SearchIndexQueue.enqueue_many(model._meta.label_lower, ids, SearchIndexQueue.ACTION_UPDATE)
+
+    @staticmethod
+    def related_ids(through, instance, model):
+        """多对多中间表里与 instance 关联的 model 一侧主键"""
+        source = target = None
+        for field in through._meta.fields:
+            if field.is_relation and field.related_model is type(instance):
+                source = field
+            elif field.is_relation and field.related_model is model:
+                target = field
+        return list(through.objects.filter(**{source.attname: instance.pk}).values_list(target.attname, flat=True))
@@ -1,32 +1,109 @@
 # signals.py
-import os
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_save, m2m_changed
+from django.db import transaction
 from django.dispatch import receiver
-from django.conf import settings
-from PIL import Image
-from .models import Photo
+from django.utils import timezone
+from . import feed_cache, navigation, suggest
+from .photo_metadata import apply_metadata, read_metadata
+from .models import MediaBlob, Photo, Articles, Category, Tag, Vaccine
+from .storage import digest_from_name
+
+
+@receiver(pre_save, sender=Photo)
+def reset_thumbnail(sender, instance, **kwargs):
+    """
+    缩略图由后台 process_thumbnails 生成，这里不再解码原图：新照片默认就是待生成，
+    已有照片换了文件时清掉旧缩略图重新排队。
+    """
+    if instance._state.adding or not instance.pk:
+        return
+    old_file = sender.objects.filter(pk=instance.pk).values_list("file", flat=True).first()
+    if old_file is not None and old_file != instance.file.name:
+        instance.thumbnail = None
+        instance.thumbnail_status = sender.THUMBNAIL_PENDING
+        instance.thumbnail_attempts = 0
+        instance.thumbnail_error = ""
+        instance.thumbnail_due_at = timezone.now()
+
+
+@receiver(pre_save, sender=Photo)
+def extract_photo_metadata(sender, instance, **kwargs):
+    """新上传的照片从文件头读取拍摄时间和 GPS 地点，只填空字段；已有照片由 backfill_exif 命令补齐"""
+    if instance.media_type != "photo" or not instance.file or getattr(instance.file, "_committed", True):
+        return
+    if instance.shot_at is None or not instance.location:
+        apply_metadata(instance, read_metadata(instance.file.file))
 
 
 @receiver(post_save, sender=Photo)
-def generate_thumbnail(sender, instance, created, **kwargs):
-    """照片上传后自动生成缩略图（仅处理图片类型，视频无需缩略图）"""
-    if instance.media_type == "photo" and not instance.thumbnail and instance.file:
-        original_path = instance.file.path
-        thumb_dir = os.path.join(os.path.dirname(original_path), "thumbs")
-        os.makedirs(thumb_dir, exist_ok=True)
-
-        original_filename = os.path.basename(original_path)
-        thumb_filename = os.path.splitext(original_filename)[0] + "_thumb.jpg"
-        thumb_path = os.path.join(thumb_dir, thumb_filename)
-
-        try:
-            with Image.open(original_path) as img:
-                img.thumbnail((300, 300), Image.Resampling.LANCZOS)
-                img.save(thumb_path, "JPEG", quality=80, optimize=True)
-
-            relative_thumb_path = os.path.relpath(thumb_path, settings.MEDIA_ROOT)
-            instance.thumbnail.name = relative_thumb_path
-            instance.save(update_fields=["thumbnail"])
-
-        except Exception as e:
-            print(f"生成缩略图失败（照片ID：{instance.id}）：{str(e)}")
\ No newline at end of file
+def track_media_blob(sender, instance, **kwargs):
+    """照片指向的文件内容变化时（新上传或换了文件）调整 MediaBlob 的引用数"""
+    digest = digest_from_name(instance.file.name) if instance.file else None
+    if digest == instance.blob_id:
+        return
+    with transaction.atomic():
+        if digest:
+            MediaBlob.acquire(digest, instance.file.name, instance.file.size)
+        if instance.blob_id:
+            MediaBlob.release(instance.blob_id)
+        sender.objects.filter(pk=instance.pk).update(blob=digest)
+    instance.blob_id = digest
+
+
+@receiver(post_delete, sender=Photo)
+def release_media_blob(sender, instance, **kwargs):
+    """删除照片只减少引用数，文件由 cleanup_media_blobs 在保留期后清理"""
+    if instance.blob_id:
+        MediaBlob.release(instance.blob_id)
+
+
+@receiver(post_save, sender=Articles)
+@receiver(post_delete, sender=Articles)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(m2m_changed, sender=Articles.categorys.through)
+@receiver(m2m_changed, sender=Articles.tags.through)
+def invalidate_feed_cache(sender, **kwargs):
+    """文章、分类、标签变化时使社区列表页缓存整体失效"""
+    feed_cache.bump_version()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_navigation(sender, **kwargs):
+    """分类、标签变化时让各进程的导航快照失效"""
+    navigation.bump_version()
+
+
+# 输入提示的数据来源：模型 -> (来源名, 提示词字段)
+SUGGEST_SOURCES = {
+    Articles: ("article", "title"),
+    Tag: ("tag", "tag"),
+    Category: ("category", "classification"),
+    Vaccine: ("vaccine", "name"),
+}
+
+
+@receiver(post_save, sender=Articles)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Vaccine)
+def update_suggestions(sender, instance, update_fields=None, **kwargs):
+    """增量更新输入提示；只改了计数、摘要等字段的保存不处理"""
+    source, field = SUGGEST_SOURCES[sender]
+    if update_fields is not None and field not in update_fields:
+        return
+    suggest.update_object(source, instance.pk, getattr(instance, field))
+
+
+@receiver(post_delete, sender=Articles)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Vaccine)
+def remove_suggestions(sender, instance, **kwargs):
+    source, _ = SUGGEST_SOURCES[sender]
+    suggest.update_object(source, instance.pk)
@@ -0,0 +1,92 @@
+"""
+照片内容寻址存储
+
+同一张照片经常被上传多次（先传到成长记录、再传到里程碑），原来每次都按上传文件名另存一份。
+ContentAddressedStorage 在写入时边读边计算 SHA-256，文件存为 <上传目录>/sha256/<前两位>/<摘要><扩展名>，
+内容相同的文件只存一份；已存在时丢弃本次写入的临时文件，并更新已有文件的修改时间，
+清理任务不会删除保留期内被复用过的文件。
+
+数据库中每份内容对应一条 MediaBlob，ref_count 为引用它的 Photo 数（见 signals.track_media_blob），
+引用数归零且超过保留期的文件由 cleanup_media_blobs 命令删除。
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+BLOB_DIR = "sha256"
+DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # 实际文件名由内容决定（见 _save），同名上传不必生成随机后缀
+        return name
+
+    def _save(self, name, content):
+        directory, filename = posixpath.split(name)
+        ext = os.path.splitext(filename)[1].lower()
+        tmp_dir = self.path(posixpath.join(directory, BLOB_DIR, "tmp"))
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, suffix=".part")
+        try:
+            # 一次读取同时完成哈希和写入，大文件不必先落盘再读一遍
+            with os.fdopen(fd, "wb") as f:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    f.write(chunk)
+            hexdigest = digest.hexdigest()
+            final_name = posixpath.join(directory, BLOB_DIR, hexdigest[:2], hexdigest + ext)
+            final_path = self.path(final_name)
+            if self._reuse(final_path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp_path, self.file_permissions_mode)
+                os.replace(tmp_path, final_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return final_name
+
+    @staticmethod
+    def _reuse(path):
+        """
+        已有相同内容时更新其修改时间并复用。清理任务删除前会先把文件改名，
+        改名后这里更新时间失败，本次上传改为写入新文件，不会指向被删除的文件。
+        """
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+
+def digest_from_name(name):
+    """内容寻址存储的文件名 -> 摘要；旧的按上传文件名保存的文件返回 None"""
+    if not name:
+        return None
+    parts = name.split("/")
+    if len(parts) < 3 or parts[-3] != BLOB_DIR:
+        return None
+    digest = os.path.splitext(parts[-1])[0]
+    return digest if DIGEST_RE.match(digest) else None
+
+
+_media_storage = None
+
+
+def get_media_storage():
+    """Photo.file 使用的存储（可调用对象，迁移中只记录引用）"""
+    global _media_storage
+    if _media_storage is None:
+        _media_storage = ContentAddressedStorage()
+    return _media_storage
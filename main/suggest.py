@@ -0,0 +1,195 @@
+"""
+搜索框输入提示
+
+在进程内存中维护一个按字符串排序的检索键数组，每个键对应若干提示词。
+检索键包括提示词本身和它的 jieba 搜索模式切词结果，所以输入“辅食”既能匹配以“辅食”开头的标签，
+也能匹配“宝宝辅食添加”这样的标题。前缀查询用二分查找定位，只扫描有限条目，不访问数据库和 Whoosh。
+
+数据来源是文章标题、标签、分类和疫苗名称。本进程内保存/删除这些对象时直接增量更新数组（见 signals.py），
+同时把缓存中的版本号+1，其它进程下次查询时发现版本变化再整体重建；SUGGEST_MAX_AGE 秒后也会重建一次兜底。
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+
+import jieba
+from django.conf import settings
+from django.core.cache import caches
+
+from main.models import Articles, Category, Tag, Vaccine
+
+SUGGEST_CACHE_ALIAS = getattr(settings, "SUGGEST_CACHE_ALIAS", "default")
+SUGGEST_MAX_AGE = getattr(settings, "SUGGEST_MAX_AGE", 3600)
+VERSION_KEY = "suggest:version"
+
+# 来源优先级：数值越小越靠前
+SOURCES = {
+    "tag": 0,
+    "category": 1,
+    "vaccine": 2,
+    "article": 3,
+}
+# 一次查询最多扫描的检索键数，保证很短的前缀也能在常数时间内返回
+MAX_SCAN = 200
+MIN_KEY_LENGTH = 1
+
+
+def normalize(text):
+    return " ".join((text or "").split()).lower()
+
+
+def _keys_for(term):
+    keys = {normalize(term)}
+    for word in jieba.cut_for_search(term):
+        word = normalize(word)
+        if len(word) > MIN_KEY_LENGTH:
+            keys.add(word)
+    keys.discard("")
+    return keys
+
+
+class SuggestIndex:
+    """
+    _keys 是去重后按字符串排序的检索键数组；_terms[key] 是该键对应的提示词，按（来源优先级，长度）排序。
+    热门前缀下可能有大量标题，按键而不是按条目扫描，每个键只取前几个提示词，查询开销与数据量无关。
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._terms = {}
+        # (来源, 主键) -> (条目, 检索键)，增量更新时用于删除旧条目
+        self._by_object = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    @staticmethod
+    def _entry(source, term):
+        return (SOURCES[source], len(term), term)
+
+    def add(self, source, pk, term):
+        self.remove(source, pk)
+        term = " ".join((term or "").split())
+        if not term:
+            return
+        entry = self._entry(source, term)
+        keys = _keys_for(term)
+        for key in keys:
+            terms = self._terms.get(key)
+            if terms is None:
+                terms = self._terms[key] = []
+                insort(self._keys, key)
+            insort(terms, entry)
+        self._by_object[(source, pk)] = (entry, keys)
+
+    def remove(self, source, pk):
+        entry, keys = self._by_object.pop((source, pk), (None, ()))
+        for key in keys:
+            terms = self._terms.get(key, [])
+            i = bisect_left(terms, entry)
+            if i < len(terms) and terms[i] == entry:
+                del terms[i]
+            if not terms:
+                self._terms.pop(key, None)
+                j = bisect_left(self._keys, key)
+                if j < len(self._keys) and self._keys[j] == key:
+                    del self._keys[j]
+
+    def load(self, items):
+        """批量建立：最后统一排序，比逐条插入快"""
+        for source, pk, term in items:
+            term = " ".join((term or "").split())
+            if not term:
+                continue
+            entry = self._entry(source, term)
+            keys = _keys_for(term)
+            for key in keys:
+                self._terms.setdefault(key, []).append(entry)
+            self._by_object[(source, pk)] = (entry, keys)
+        for terms in self._terms.values():
+            terms.sort()
+        self._keys = sorted(self._terms)
+
+    def suggest(self, prefix, limit=8):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        keys = self._keys
+        i = bisect_left(keys, prefix)
+        # 同一个提示词可能由多个检索键命中，只保留排名最高的一次
+        found = {}
+        for key in keys[i:i + MAX_SCAN]:
+            if not key.startswith(prefix):
+                break
+            for priority, length, term in self._terms[key][:limit]:
+                # 提示词本身以输入开头的排在前面，其次按来源和长度
+                rank = (not term.lower().startswith(prefix), priority, length)
+                if term not in found or rank < found[term]:
+                    found[term] = rank
+        return sorted(found, key=lambda term: (found[term], term))[:limit]
+
+
+def _load_items():
+    yield from (("article", pk, title) for pk, title in Articles.objects.values_list("pk", "title").iterator())
+    yield from (("tag", pk, name) for pk, name in Tag.objects.values_list("pk", "tag"))
+    yield from (("category", pk, name) for pk, name in Category.objects.values_list("pk", "classification"))
+    yield from (("vaccine", pk, name) for pk, name in Vaccine.objects.values_list("pk", "name"))
+
+
+_lock = threading.Lock()
+_state = {"version": None, "loaded_at": 0.0, "index": None}
+
+
+def get_version():
+    cache = caches[SUGGEST_CACHE_ALIAS]
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_version():
+    cache = caches[SUGGEST_CACHE_ALIAS]
+    cache.add(VERSION_KEY, 1, None)
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+        return 1
+
+
+def get_index():
+    version = get_version()
+    state = _state
+    if state["version"] == version and time.monotonic() - state["loaded_at"] < SUGGEST_MAX_AGE:
+        return state["index"]
+    with _lock:
+        if _state["version"] != version or time.monotonic() - _state["loaded_at"] >= SUGGEST_MAX_AGE:
+            index = SuggestIndex()
+            index.load(_load_items())
+            _state.update(version=version, loaded_at=time.monotonic(), index=index)
+        return _state["index"]
+
+
+def suggest(prefix, limit=8):
+    index = get_index()
+    # 查询与增量更新共用一把锁，避免读到正在移动的数组
+    with _lock:
+        return index.suggest(prefix, limit)
+
+
+def update_object(source, pk, term=None):
+    """本进程内增量更新：term 为 None 表示删除"""
+    with _lock:
+        index = _state["index"]
+        if index is not None:
+            if term is None:
+                index.remove(source, pk)
+            else:
+                index.add(source, pk, term)
+    version = bump_version()
+    with _lock:
+        # 本进程已是最新，只有版本号被其它进程改过时才需要重建
+        if _state["index"] is not None and _state["version"] is not None and version == _state["version"] + 1:
+            _state["version"] = version
@@ -1,8 +1,10 @@
 from django.template.library import Library
-from django.utils.html import strip_tags
+from django.utils.html import format_html, strip_tags
 from django.utils.text import Truncator
 
-from main.models import Category, Tag, Collect, Like
+from main import renditions
+from main.models import Collect, Like
+from main.navigation import get_navigation
 from users.models import User
 
 register = Library()
@@ -21,17 +23,17 @@ def get_usersname():
 @register.simple_tag
 def get_categorys():
     """
-    分类
+    分类（顶级分类，来自进程级导航缓存）
     :return:
     """
-    return Category.objects.filter(classification_parent__isnull=True)
+    return get_navigation().root_categories
 @register.simple_tag
 def get_tags():
     """
-    标签
+    标签（来自进程级导航缓存）
     :return:
     """
-    return Tag.objects.filter()
+    return get_navigation().tags
 
 
 @register.filter(name='safe_truncate')
@@ -63,3 +65,25 @@ def liked_state(article,user):
     return False
 
 
+
+
+@register.simple_tag
+def photo_img(photo, name="grid", css_class="", alt=""):
+    """
+    输出带 srcset 的照片 <img>，图片由 main:photo_rendition 按需生成对应尺寸；
+    视频或没有文件时退回原文件地址
+    """
+    if photo.media_type != "photo" or not photo.file:
+        return format_html('<img src="{}" class="{}" alt="{}" loading="lazy">',
+                           photo.file.url if photo.file else "", css_class, alt)
+    src, srcset, sizes = renditions.srcset(photo, name)
+    return format_html('<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" loading="lazy" decoding="async">',
+                       src, srcset, sizes, css_class, alt)
+
+
+@register.simple_tag
+def photo_url(photo, name="lightbox"):
+    """照片某个尺寸的地址（取该尺寸的 2x 宽度），如“查看大图”的链接"""
+    if photo.media_type != "photo" or not photo.file:
+        return photo.file.url if photo.file else ""
+    return renditions.rendition_url(photo, name, renditions.RENDITIONS[name].widths[-1])
@@ -0,0 +1,163 @@
+"""
+照片缩略图
+
+上传请求只保存原图，Photo.thumbnail_status 默认为“待生成”。后台 process_thumbnails 命令按批领取
+到期的待生成照片，交给进程池解码和缩放，完成后用 update() 写回 thumbnail 字段（不再触发 save/full_clean）。
+
+领取时把状态改为“生成中”，thumbnail_due_at 改为租约到期时间；工作进程中途退出时，租约到期后会被重新领取。
+失败按指数退避重试，超过 THUMBNAIL_MAX_ATTEMPTS 次或原图不存在/无法识别时标记为“生成失败”，
+可用 backfill_thumbnails --failed 重新排队。像素过多或超过单进程解码预算的图片同样直接标记为失败。
+"""
+import os
+import posixpath
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from main.image_io import ImageTooLarge, open_image
+from main.models import Photo
+from main.storage import digest_from_name
+
+THUMBNAIL_SIZE = (300, 300)
+THUMBNAIL_MAX_ATTEMPTS = getattr(settings, "THUMBNAIL_MAX_ATTEMPTS", 5)
+# 第 n 次失败后等待 RETRY_DELAY * 2**(n-1) 秒再重试
+RETRY_DELAY = 30
+# 领取后多久未完成视为工作进程已退出
+LEASE_SECONDS = 600
+# 写回时领取已失效（生成期间照片换了文件、被重新排队）的计数键
+SUPERSEDED = "superseded"
+
+
+def thumbnail_name(file_name):
+    """原图 baby_media/a.jpg -> baby_media/thumbs/a_thumb.jpg，与之前同步生成时的路径一致"""
+    directory, filename = posixpath.split(file_name)
+    return posixpath.join(directory, "thumbs", os.path.splitext(filename)[0] + "_thumb.jpg")
+
+
+def render_thumbnail(source_path, target_path):
+    """
+    在工作进程中执行，只依赖文件路径，不访问数据库。
+    返回 (错误信息, 是否不必重试)，成功时错误信息为 None。
+    """
+    tmp_path = f"{target_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        # 按缩略图尺寸缩小解码，大图不会整张解到内存里（见 image_io.py）
+        with open_image(source_path, max(THUMBNAIL_SIZE)) as img:
+            img.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+            # 带透明通道的 PNG/GIF 不能直接存成 JPEG
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            img.save(tmp_path, "JPEG", quality=80, optimize=True)
+        # 先写临时文件再改名，页面不会读到写了一半的缩略图
+        os.replace(tmp_path, target_path)
+        return None, False
+    except (FileNotFoundError, UnidentifiedImageError, ImageTooLarge, Image.DecompressionBombError) as e:
+        return f"{type(e).__name__}: {e}", True
+    except Exception as e:
+        return f"{type(e).__name__}: {e}", False
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def claim_batch(limit):
+    """领取一批到期的照片（含租约已过期的生成中照片），返回 Photo 列表"""
+    now = timezone.now()
+    due = Q(thumbnail_status__in=[Photo.THUMBNAIL_PENDING, Photo.THUMBNAIL_PROCESSING], thumbnail_due_at__lte=now)
+    ids = list(Photo.objects.filter(due).order_by("thumbnail_due_at").values_list("pk", flat=True)[:limit])
+    if not ids:
+        return []
+    lease = now + timedelta(seconds=LEASE_SECONDS)
+    # 条件更新：多个工作进程同时领取时，只有一个能把同一张照片改成自己的租约
+    Photo.objects.filter(due, pk__in=ids).update(thumbnail_status=Photo.THUMBNAIL_PROCESSING, thumbnail_due_at=lease)
+    return list(
+        Photo.objects.filter(pk__in=ids, thumbnail_status=Photo.THUMBNAIL_PROCESSING, thumbnail_due_at=lease)
+        .only("pk", "file", "media_type", "thumbnail_attempts", "thumbnail_due_at")
+    )
+
+
+def _claimed(photo):
+    """
+    仍由本次领取持有的照片。生成期间换了文件时 reset_thumbnail 会把照片重新排队，
+    状态和租约都已改变，旧结果写回时匹配 0 行，不会覆盖新的排队状态
+    """
+    return Photo.objects.filter(
+        pk=photo.pk, thumbnail_status=Photo.THUMBNAIL_PROCESSING, thumbnail_due_at=photo.thumbnail_due_at,
+    )
+
+
+def mark_done(photo, name):
+    """写回结果，返回新状态；领取已失效时返回 None"""
+    updated = _claimed(photo).update(
+        thumbnail=name,
+        thumbnail_status=Photo.THUMBNAIL_DONE,
+        thumbnail_attempts=photo.thumbnail_attempts + 1,
+        thumbnail_error="",
+    )
+    return Photo.THUMBNAIL_DONE if updated else None
+
+
+def mark_skipped(photo):
+    updated = _claimed(photo).update(thumbnail_status=Photo.THUMBNAIL_SKIPPED, thumbnail_error="")
+    return Photo.THUMBNAIL_SKIPPED if updated else None
+
+
+def mark_failed(photo, error, permanent=False):
+    attempts = photo.thumbnail_attempts + 1
+    if permanent or attempts >= THUMBNAIL_MAX_ATTEMPTS:
+        status, due_at = Photo.THUMBNAIL_FAILED, timezone.now()
+    else:
+        status = Photo.THUMBNAIL_PENDING
+        due_at = timezone.now() + timedelta(seconds=RETRY_DELAY * 2 ** (attempts - 1))
+    updated = _claimed(photo).update(
+        thumbnail_status=status,
+        thumbnail_attempts=attempts,
+        thumbnail_error=error[:255],
+        thumbnail_due_at=due_at,
+    )
+    return status if updated else None
+
+
+def process_batch(executor, limit):
+    """
+    领取一批照片交给进程池，等全部完成后写回结果，返回 {状态: 数量}；领取期间被重新排队的照片记为 "superseded"。
+    工作进程崩溃（如内存不足被杀）时本批照片按普通失败重试，写回后抛出 BrokenProcessPool，由调用方重建进程池。
+    """
+    counts = {}
+    broken = None
+    jobs = {}
+    for photo in claim_batch(limit):
+        if photo.media_type != "photo" or not photo.file:
+            status = mark_skipped(photo) or SUPERSEDED
+            counts[status] = counts.get(status, 0) + 1
+            continue
+        name = thumbnail_name(photo.file.name)
+        # 内容寻址的原图同一内容只存一份，缩略图路径也相同，重复上传的照片直接复用
+        if digest_from_name(photo.file.name) and default_storage.exists(name):
+            status = mark_done(photo, name) or SUPERSEDED
+            counts[status] = counts.get(status, 0) + 1
+            continue
+        future = executor.submit(render_thumbnail, photo.file.path, default_storage.path(name))
+        jobs[future] = (photo, name)
+
+    for future, (photo, name) in jobs.items():
+        try:
+            error, permanent = future.result()
+        except BrokenProcessPool as e:
+            broken = e
+            error, permanent = f"{type(e).__name__}: {e}", False
+        if error is None:
+            status = mark_done(photo, name)
+        else:
+            status = mark_failed(photo, error, permanent)
+        status = status or SUPERSEDED
+        counts[status] = counts.get(status, 0) + 1
+    if broken is not None:
+        raise broken
+    return counts
@@ -8,6 +8,16 @@ urlpatterns = [
 
     path('article_list/',views.ArticleListView.as_view(),name="article_list"),
 
+    path('feed_cache_stats/',views.feed_cache_stats,name="feed_cache_stats"),
+
+    path('search_index_stats/',views.search_index_stats,name="search_index_stats"),
+
+    # 家庭记录搜索（仅限当前用户关联的宝宝）
+    path('family_search/',views.family_search,name="family_search"),
+
+    # 搜索框输入提示（AJAX 接口）
+    path('suggest/',views.search_suggest,name="search_suggest"),
+
     path('article_manage/',views.ArticleManageView.as_view(),name="article_manage"),
 
     path('article_detail/<int:pk>/',views.ArticleDetailView.as_view(),name="article_detail"),
@@ -37,6 +47,9 @@ urlpatterns = [
     # 上传照片（AJAX 接口）
     path('upload_photos/', views.upload_photos, name='upload_photos'),
 
+    # 照片各尺寸版本（按需生成）
+    path('photo/<uuid:pk>/<str:name>/<int:width>/', views.photo_rendition, name='photo_rendition'),
+
 #     疫苗
     path('vaccine_list/',views.VaccineListView.as_view(),name='vaccine_list'),
 
@@ -0,0 +1,50 @@
+"""
+当前登录用户对文章的互动状态（是否点赞、是否收藏）
+
+模板过滤器 has_liked / has_collected 每篇文章各查一次库，列表页会变成N+1查询。
+这里按页批量加载：一页文章只需要两条查询，结果缓存在 request 上，同一请求内重复调用不再查库。
+"""
+from main.models import Like, Collect
+
+
+class ViewerState:
+    """一次请求内当前用户已点赞、已收藏的文章ID集合"""
+
+    def __init__(self):
+        self.loaded_ids = set()
+        self.liked_ids = set()
+        self.collected_ids = set()
+
+    def has_liked(self, article_id):
+        return article_id in self.liked_ids
+
+    def has_collected(self, article_id):
+        return article_id in self.collected_ids
+
+
+def get_viewer_state(request, article_ids):
+    """
+    批量获取当前用户对给定文章的点赞/收藏状态
+    :param request: 当前请求，状态缓存在 request._viewer_state 上
+    :param article_ids: 本页需要渲染的文章ID
+    :return: ViewerState
+    """
+    state = getattr(request, '_viewer_state', None)
+    if state is None:
+        state = request._viewer_state = ViewerState()
+
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return state
+
+    # 只查询本次请求里还没加载过的文章
+    missing = set(article_ids) - state.loaded_ids
+    if missing:
+        state.liked_ids.update(
+            Like.objects.filter(user=user, article_id__in=missing).values_list('article_id', flat=True)
+        )
+        state.collected_ids.update(
+            Collect.objects.filter(user=user, article_id__in=missing).order_by().values_list('article_id', flat=True)
+        )
+        state.loaded_ids.update(missing)
+    return state
@@ -1,20 +1,36 @@
+import json
 import os
+from datetime import MAXYEAR, datetime
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import Q
-from django.http import JsonResponse
+from django.http import FileResponse, HttpResponse, JsonResponse, Http404
 from django.shortcuts import render, get_object_or_404
 from django.urls import reverse_lazy
 from django.utils.decorators import method_decorator
 from django.views.decorators.http import require_POST
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
+from haystack import connections
+from PIL import Image
 
 from main.forms import ArticleForm, RecordForm, VaccineForm, VaccineRecordForm, EventForm
 from main.models import Articles, Category, Collect, ArticleComments, Like, Record, Photo, Vaccine, VaccineRecord, \
     Event, Tag
+from main import family_search as family_search_module
+from main import feed_cache, renditions, suggest
+from main.article_search import facet_counts, filter_articles, search_article_ids
+from main.category_tree import get_category_tree
+from main.comment_tree import load_comment_tree
+from main.navigation import get_navigation
+from main.pagination import KeysetPaginationMixin
+from main.related_articles import get_related
+from main.viewer_state import get_viewer_state
 from users.models import User, Baby
 
 
@@ -28,45 +44,69 @@ def index(request):
 社区-文章
 """
 
-class ArticleListView(ListView):
+
+def parse_month(value):
+    """月份筛选参数，如 2025-10；格式不对或月份不存在（2025-13、0000-05）时返回 None，按未筛选处理"""
+    try:
+        month = datetime.strptime(value, "%Y-%m")
+    except ValueError:
+        return None
+    # 筛选区间的上界是下个月一日，9999-12 的下个月无法表示
+    if month.year == MAXYEAR and month.month == 12:
+        return None
+    return month.strftime("%Y-%m")
+
+
+class ArticleListView(KeysetPaginationMixin, ListView):
     # model = Articles
     context_object_name = 'articles'
     template_name = 'main/article_list.html'
     paginate_by = 9
+    keyset_ordering = ('-created_articles', '-id')
+
+    def get(self, request, *args, **kwargs):
+        # 匿名访客的列表页走整页缓存
+        if not feed_cache.is_cacheable(request):
+            return super().get(request, *args, **kwargs)
+        cached = feed_cache.get_response(request)
+        if cached is not None:
+            return cached
+        response = super().get(request, *args, **kwargs)
+        response.add_post_render_callback(lambda r: feed_cache.store_response(request, r))
+        return response
+
+    def get_search_filters(self):
+        """从查询参数取出检索条件；无效的分类、标签、月份参数按未筛选处理，不存在的分类返回404"""
+        category_id = self.request.GET.get('category', 'all')
+        tag_id = self.request.GET.get('tag', 'all')
+        month = self.request.GET.get('month', '')
+        filters = {
+            'query': self.request.GET.get('query', '').strip(),
+            'category': None,
+            'tag': tag_id if tag_id.isdigit() else None,
+            'month': parse_month(month),
+        }
+        if category_id.isdigit():
+            if get_category_tree().get(int(category_id)) is None:
+                raise Http404("分类不存在")
+            filters['category'] = category_id
+        return filters
 
     def get_queryset(self):
-        category_id = self.request.GET.get('category',"all")
-        # search_query = self.request.GET.get('query', '').strip()
-
         queryset = Articles.objects.filter()
         # queryset = Articles.objects.filter(state=Articles.APPROVED)
 
-        if category_id and category_id != 'all' and category_id.isdigit():
-            cat = get_object_or_404(Category,id=category_id)
-            queryset = queryset.filter(categorys=cat)
-
-        # 富文本搜索修：先剥离HTML标签，再匹配纯文本
-        # if search_query:
-        #     # 用extra()执行SQL函数，在数据库层面剥离HTML标签
-        #     # 注：不同数据库函数略有差异，以下适配MySQL；若用PostgreSQL，将REGEXP_REPLACE换成regexp_replace
-        #     queryset = queryset.extra(
-        #         where=[
-        #             # 标题搜索
-        #             "main_articles.title LIKE %s",
-        #             # 富文本content搜索：先剥离HTML标签，再匹配关键词
-        #             "REGEXP_REPLACE(main_articles.content, '<[^>]+>', '', 1) LIKE %s",
-        #             # # 3. 作者名搜索：必须加外键关联条件，否则会出现表数据笛卡尔积（无意义匹配）
-        #             # "main_articles.author_id = users_user.id AND users_user.username LIKE %s"
-        #         ],
-        #         params=[
-        #             f'%{search_query}%',  # 标题匹配
-        #             f'%{search_query}%',  # 剥离标签后的content匹配
-        #             # f'%{search_query}%'  # 作者名匹配
-        #         ],
-        #         # tables=['users_user']  # 关联用户表
-        #     )
-
-        return queryset.order_by('-created_articles')
+        # 有关键词时检索和分类/标签/月份筛选一次性在 Whoosh 索引中完成，只用命中的ID回表；
+        # 纯筛选在数据库中完成，不受检索结果条数上限影响（父分类都包含子分类的文章）
+        filters = self.get_search_filters()
+        if filters['query']:
+            queryset = queryset.filter(pk__in=search_article_ids(**filters))
+        else:
+            filters.pop('query')
+            queryset = filter_articles(queryset, **filters)
+
+        # 列表只展示预先计算的摘要，不加载整段富文本；作者头像随文章一并连表取出
+        return queryset.select_related('author').defer('content').order_by('-created_articles')
 
 
 
@@ -76,13 +116,84 @@ class ArticleListView(ListView):
         # 当前分类ID（用于模板高亮选中分类）
         context['category'] = self.request.GET.get('category', 'all')
         context['tag'] = self.request.GET.get('tag', 'all')
+        context['month'] = self.request.GET.get('month', '')
         # 当前搜索关键词（用于模板回显搜索框、显示搜索结果提示）
         context['query'] = self.request.GET.get('query', '').strip()
-        # 所有分类（用于模板渲染分类筛选栏）
-        context['all_categories'] = Category.objects.all()
-        context['all_tags'] = Tag.objects.all()
+        # 所有分类、标签（用于模板渲染筛选栏），取自进程级导航缓存
+        nav = get_navigation()
+        context['all_categories'] = nav.all_categories
+        context['all_tags'] = nav.tags
+        # 筛选栏每一项的文章数，来自索引的分面统计
+        counts = facet_counts(context['query'])
+        context['category_options'] = [(c, counts['category'].get(str(c.id), 0)) for c in nav.all_categories]
+        context['tag_options'] = [(t, counts['tag'].get(str(t.id), 0)) for t in nav.tags]
+        context['month_options'] = sorted(counts['month'].items(), reverse=True)
+        # 当前用户对本页文章的点赞/收藏状态：整页两条查询
+        viewer_state = get_viewer_state(self.request, [a.id for a in context['articles']])
+        context['liked_ids'] = viewer_state.liked_ids
+        context['collected_ids'] = viewer_state.collected_ids
         return context
 
+@login_required(login_url="users:login")
+def family_search(request):
+    """搜索当前用户家庭内宝宝的成长记录、里程碑、用药、体检和接种记录"""
+    query = request.GET.get('q', '').strip()
+    baby_ids = family_search_module.family_baby_ids(request.user)
+    baby = request.GET.get('baby', '')
+    if baby:
+        # 只能缩小到自己家庭的宝宝
+        baby_ids = [baby_id for baby_id in baby_ids if str(baby_id) == baby]
+        if not baby_ids:
+            raise Http404("宝宝不存在")
+    sqs = family_search_module.family_search_queryset(query, baby_ids)
+    page_obj = Paginator(sqs, 20).get_page(request.GET.get('page'))
+    results = [
+        {
+            'title': result.family_title,
+            'date': result.family_date,
+            'type': result.model._meta.verbose_name,
+            'url': family_search_module.result_url(result),
+        }
+        for result in page_obj.object_list
+    ]
+    return render(request, 'main/family_search.html', {
+        'query': query,
+        'baby': baby,
+        'babies': Baby.objects.filter(parents=request.user),
+        'page_obj': page_obj,
+        'results': results,
+    })
+
+@login_required(login_url="users:login")
+def feed_cache_stats(request):
+    """列表页缓存命中统计，仅管理员可见"""
+    if not request.user.is_staff:
+        raise PermissionDenied
+    return JsonResponse(feed_cache.get_stats())
+
+@login_required(login_url="users:login")
+def search_index_stats(request):
+    """搜索索引的段数、文档数和最近一次合并的统计，仅管理员可见"""
+    if not request.user.is_staff:
+        raise PermissionDenied
+    backend = connections['default'].get_backend()
+    stats = backend.index_stats()
+    if hasattr(backend, 'highlight_stats'):
+        stats['highlight'] = backend.highlight_stats()
+    stats['last_merge'] = None
+    stats_file = getattr(settings, 'WHOOSH_MERGE_STATS_FILE', None)
+    if stats_file and os.path.exists(stats_file):
+        with open(stats_file, encoding='utf-8') as f:
+            stats['last_merge'] = json.load(f)
+    return JsonResponse(stats)
+
+def search_suggest(request):
+    """搜索框输入提示：查进程内的前缀索引，不访问数据库和Whoosh"""
+    query = request.GET.get('q', '').strip()[:50]
+    response = JsonResponse({'q': query, 'suggestions': suggest.suggest(query)})
+    response['Cache-Control'] = 'max-age=60'
+    return response
+
 @method_decorator(login_required(login_url="users:login"), name="dispatch")
 class ArticleManageView(ListView):
     model = Articles
@@ -102,14 +213,18 @@ class ArticleDetailView(DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        current_article = self.get_object()
-
-        context["content"] = ArticleComments.objects.filter(
-            article=current_article,
-            is_deleted = False
-        ).order_by("-create_time")
-
-        context["content_count"] = context["content"].count()
+        current_article = self.object
+
+        # 评论树：一条查询加载全部评论和评论用户，顶层评论按游标分页
+        comment_page = load_comment_tree(current_article, cursor=self.request.GET.get("comment_cursor"))
+        context["content"] = comment_page.threads
+        context["comment_page"] = comment_page
+        context["content_count"] = comment_page.total
+        viewer_state = get_viewer_state(self.request, [current_article.id])
+        context['liked_ids'] = viewer_state.liked_ids
+        context['collected_ids'] = viewer_state.collected_ids
+        # 相关阅读：后台预先计算，这里只按索引查一次
+        context['related_articles'] = get_related(current_article)
         # 传递CSRF令牌（Ajax提交评论需要，也可在模板中直接用{ % csrf_token %}）
         context['csrf_token'] = self.request.META.get('CSRF_COOKIE', '')
 
@@ -136,23 +251,26 @@ def add_comment(request, article_id):
         article = Articles.objects.get(id=article_id, state=Articles.APPROVED)  # 只允许对审核通过的文章评论
         user = User.objects.get(id=request.POST.get('user', ''))
 
-        try:
-
-            parent =  ArticleComments.objects.get(id = request.POST.get("parent"))
-            instance =  ArticleComments.objects.create(
-                            user=request.user,
-                            article=article,
-                            content=comment_content,
-                            parent =parent,
-                        )
-        except ArticleComments.DoesNotExist:
-            instance = ArticleComments.objects.create(
-                user=request.user,
-                article=article,
-                content=comment_content
-            )
+        with transaction.atomic():
+            try:
+
+                parent =  ArticleComments.objects.get(id = request.POST.get("parent"))
+                instance =  ArticleComments.objects.create(
+                                user=request.user,
+                                article=article,
+                                content=comment_content,
+                                parent =parent,
+                            )
+            except ArticleComments.DoesNotExist:
+                instance = ArticleComments.objects.create(
+                    user=request.user,
+                    article=article,
+                    content=comment_content
+                )
+            # 4. 评论数原子+1
+            Articles.adjust_counter(article.pk, 'comment_count', 1)
         # 5. 返回成功响应
-        new_comment_count = ArticleComments.objects.filter(article=article, is_deleted=False).count()
+        new_comment_count = Articles.objects.filter(pk=article.pk).values_list('comment_count', flat=True).first()
 
         return JsonResponse({
             'status': 'success',
@@ -179,6 +297,8 @@ def delete_comment(request,article_id):
         c = ArticleComments.objects.filter(id=comment_id,article = article_id).first()
         if c:
             c.delete()
+            # 删除会级联删除任意层级的子评论，这条低频路径直接用子查询重算该文章的评论数
+            Articles.rebuild_counters(Articles.objects.filter(pk=article_id))
             return JsonResponse({
                 "code": 0,
                 "msg": "删除成功",
@@ -224,13 +344,18 @@ def collect_articles(request):
     u_id = request.POST.get('user')
     user = get_object_or_404(User, id=u_id)
     articles = get_object_or_404(Articles, id=a_id)
-    collect = Collect.objects.filter(article=articles, user=user).first()
-    if collect is None:
-        Collect.objects.create(article=articles, user=user)
-        return JsonResponse({'code': 200,'msg':'收藏成功','status':1})
-    else:
-        collect.delete()
-        return JsonResponse({'code': 200, 'msg': '取消收藏成功', 'status': 1})
+    # 先尝试删除：删除成功说明是取消收藏，否则新建收藏，计数随之原子增减
+    with transaction.atomic():
+        deleted, _ = Collect.objects.filter(article=articles, user=user).delete()
+        if deleted:
+            Articles.adjust_counter(articles.pk, 'collect_count', -1)
+            msg = '取消收藏成功'
+        else:
+            Collect.objects.create(article=articles, user=user)
+            Articles.adjust_counter(articles.pk, 'collect_count', 1)
+            msg = '收藏成功'
+    collect_count = Articles.objects.filter(pk=articles.pk).values_list('collect_count', flat=True).first()
+    return JsonResponse({'code': 200, 'msg': msg, 'status': 1, 'collect_count': collect_count})
 
 @login_required(login_url="users:login")
 def like_articles(request):
@@ -239,24 +364,28 @@ def like_articles(request):
     user = get_object_or_404(User, id=u_id)
     article = get_object_or_404(Articles, id=a_id)
 
-    like = Like.objects.filter(article=article, user=user).first()
-
-    if like is None:
-        Like.objects.create(article=article, user=user)
-        like_count = Like.objects.filter(article=article).count()
-        return JsonResponse({"code": 200, "status": 1, "msg":"点赞成功","like_count":like_count})
-    else:
-        like.delete()
-        like_count = Like.objects.filter(article=article).count()
-        return JsonResponse({"code":200,"status":1,"msg":"取消点赞成功","like_count":like_count})
+    with transaction.atomic():
+        deleted, _ = Like.objects.filter(article=article, user=user).delete()
+        if deleted:
+            Articles.adjust_counter(article.pk, 'like_count', -1)
+            msg = "取消点赞成功"
+        else:
+            Like.objects.create(article=article, user=user)
+            Articles.adjust_counter(article.pk, 'like_count', 1)
+            msg = "点赞成功"
+    # 直接读取冗余计数列，不再对Like表做COUNT
+    like_count = Articles.objects.filter(pk=article.pk).values_list('like_count', flat=True).first()
+    return JsonResponse({"code": 200, "status": 1, "msg": msg, "like_count": like_count})
 
 
 # Record成长记录
-class RecordListView(ListView):
+class RecordListView(KeysetPaginationMixin, ListView):
     model = Record
     context_object_name = 'records'
     template_name = "main/record_list.html"
     paginate_by = 9
+    # 走 (author, -created_at) 索引
+    keyset_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -339,7 +468,7 @@ class RecordCreateView(LoginRequiredMixin, CreateView):
             if ext not in ['.jpg', '.jpeg', '.png', '.gif']:
                 continue  # 跳过非图片文件
 
-            # 创建图片记录并关联到当前记录
+            # 创建图片记录并关联到当前记录（缩略图在后台生成）
             Photo.objects.create(
                 baby=record.baby,  # 与记录关联同一宝宝
                 record=record,  # 关联当前创建的记录
@@ -348,6 +477,26 @@ class RecordCreateView(LoginRequiredMixin, CreateView):
                 uploaded_by=self.request.user
             )
 
+# 照片的各尺寸版本：第一次请求时生成并写入磁盘缓存，只有宝宝的家庭成员可以查看
+@login_required(login_url="users:login")
+def photo_rendition(request, pk, name, width):
+    if not renditions.is_valid(name, width):
+        raise Http404("不支持的图片尺寸")
+    photo = get_object_or_404(Photo, pk=pk, baby__parents=request.user, media_type="photo")
+    try:
+        fp = renditions.open_rendition(photo, name, width)
+    except TimeoutError:
+        # 本进程的解码内存预算被占满，稍后重试
+        response = HttpResponse("图片处理繁忙，请稍后再试", status=503)
+        response["Retry-After"] = "5"
+        return response
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise Http404("图片不存在或无法处理")
+    response = FileResponse(fp, content_type="image/jpeg")
+    # URL 中带有原图版本，内容不会变化
+    response["Cache-Control"] = "private, max-age=31536000, immutable"
+    return response
+
 # 上传照片（关联已有记录）- 函数视图（支持 AJAX 异步上传多张）
 @login_required
 def upload_photos(request):
@@ -367,17 +516,16 @@ def upload_photos(request):
         for photo_file in request.FILES.getlist('photos'):
             # 自动判断媒体类型（照片/视频）
             file_ext = os.path.splitext(photo_file.name)[-1].lower()
-            media_type = 'photo' if file_ext in ['jpg', 'jpeg', 'png', 'gif'] else 'video'
+            media_type = 'photo' if file_ext in ['.jpg', '.jpeg', '.png', '.gif'] else 'video'
 
-            # 创建照片记录
+            # 创建照片记录；缩略图由后台 process_thumbnails 生成，这里只保存原图
             Photo.objects.create(
                 baby=record.baby,
                 record=record,
                 file=photo_file,
                 media_type=media_type,
                 uploaded_by=request.user,
-                # 若前端传递拍摄时间，可在此处接收（如 request.POST.get('shot_at')）
-                # shot_at=request.POST.get('shot_at') if request.POST.get('shot_at') else None
+                # 拍摄时间和地点在保存时从照片 EXIF 读取（见 signals.extract_photo_metadata）
             )
             photo_count += 1
 
@@ -403,11 +551,13 @@ class VaccineDetailView(DetailView):
 
 
 # 接种记录
-class VaccineRecordListView(ListView):
+class VaccineRecordListView(KeysetPaginationMixin, ListView):
     model = VaccineRecord
     context_object_name = 'vaccine_records'
     template_name = "main/vaccine_record_list.html"
     paginate_by = 9
+    # 走 (created_by, shot_date) 索引
+    keyset_ordering = ('shot_date', 'id')
 
     def get_queryset(self):
         """只查询当前用户的接种记录"""
@@ -454,11 +604,12 @@ class VaccineRecordCreateView(CreateView):
         return super().form_valid(form)
 
 # 里程碑事件
-class EventListView(ListView):
+class EventListView(KeysetPaginationMixin, ListView):
     model = Event
     context_object_name = 'events'
     template_name = "main/event_list.html"
     paginate_by = 9
+    keyset_ordering = ('-happen_date', '-id')
     def get_queryset(self):
 
         # 筛选所有事件，按发生日期倒序
@@ -1,9 +1,12 @@
+import copy
 import json
 import os
 import re
 import shutil
 import threading
+import time
 import warnings
+from collections import OrderedDict
 from datetime import date, datetime
 
 from django.conf import settings
@@ -33,7 +36,7 @@ from haystack.utils.app_loading import haystack_get_model
 
 
 # gg
-from jieba.analyse import ChineseAnalyzer
+from main.jieba_loader import get_analyzer
 
 try:
     import whoosh
@@ -48,18 +51,20 @@ if not hasattr(whoosh, "__version__") or whoosh.__version__ < (2, 5, 0):
 
 # Bubble up the correct error.
 from whoosh import index
-from whoosh.analysis import StemmingAnalyzer
+from whoosh.analysis import StemmingAnalyzer, Token
 from whoosh.fields import BOOLEAN, DATETIME
 from whoosh.fields import ID as WHOOSH_ID
 from whoosh.fields import IDLIST, KEYWORD, NGRAM, NGRAMWORDS, NUMERIC, TEXT, Schema
 from whoosh.filedb.filestore import FileStorage, RamStorage
-from whoosh.highlight import ContextFragmenter, HtmlFormatter
+from whoosh.highlight import FIRST, BasicFragmentScorer, ContextFragmenter, HtmlFormatter, PinpointFragmenter
 from whoosh.highlight import highlight as whoosh_highlight
+from whoosh.highlight import top_fragments
 from whoosh.qparser import FuzzyTermPlugin, QueryParser
+from whoosh.query import And, Every
 from whoosh.searching import ResultsPage
 from whoosh.sorting import Count, DateRangeFacet, FieldFacet
 from whoosh.support.relativedelta import relativedelta as RelativeDelta
-from whoosh.writing import AsyncWriter
+from whoosh.writing import MERGE_SMALL, AsyncWriter
 
 DATETIME_REGEX = re.compile(
     r"^(?P<year>\d{4})-(?P<month>\d{2})-(?P<day>\d{2})T(?P<hour>\d{2}):(?P<minute>\d{2}):(?P<second>\d{2})(\.\d{3,6}Z?)?$"
@@ -67,6 +72,14 @@ DATETIME_REGEX = re.compile(
 LOCALS = threading.local()
 LOCALS.RAM_STORE = None
 
+# 高亮摘要：索引中的 snippet 字段保存截断后的纯文本和每个词的字符位置（见 search_indexes.SnippetField）
+SNIPPET_FIELD = "snippet"
+# 没有 snippet 字段的文档退回到主字段高亮时，最多处理的字符数
+HIGHLIGHT_MAX_CHARS = 1000
+# 每条结果最多取的片段数和每个片段的长度
+HIGHLIGHT_TOP_FRAGMENTS = 2
+HIGHLIGHT_FRAGMENT_CHARS = 120
+
 
 class WhooshHtmlFormatter(HtmlFormatter):
     """
@@ -122,8 +135,26 @@ class WhooshSearchBackend(BaseSearchBackend):
                 % connection_alias
             )
 
+        # 查询结果缓存的条数上限，0 表示不缓存
+        self.result_cache_size = connection_options.get("RESULT_CACHE_SIZE", 256)
+        # 高亮摘要缓存的条数上限，0 表示不缓存
+        self.snippet_cache_size = connection_options.get("SNIPPET_CACHE_SIZE", 2048)
+        # Haystack 的连接按线程隔离，每个线程各自持有一个长期复用的 searcher
+        self._searcher = None
+
         self.log = logging.getLogger("haystack")
 
+    # 查询结果的 LRU 缓存，进程内所有线程共享。
+    # 键里带有索引的代数和段ID，索引提交新数据后旧键自然不再命中，无需主动失效。
+    _result_cache = OrderedDict()
+    _result_cache_lock = threading.Lock()
+
+    # 高亮摘要的 LRU 缓存，键为 (索引, 文档, 摘要文本哈希, 查询词)，文档内容变化后哈希不同，旧键自然失效
+    _snippet_cache = OrderedDict()
+    _snippet_cache_lock = threading.Lock()
+    # 高亮累计统计，供 search_index_stats 查看
+    _highlight_stats = {"pages": 0, "hits": 0, "cache_hits": 0, "seconds": 0.0}
+
     def setup(self):
         """
         Defers loading until needed.
@@ -173,8 +204,84 @@ class WhooshSearchBackend(BaseSearchBackend):
             except index.EmptyIndexError:
                 self.index = self.storage.create_index(self.schema)
 
+        self._close_searcher()
         self.setup_complete = True
 
+    def _get_searcher(self):
+        """
+        复用同一个 searcher，索引有新提交时用 refresh() 更新（未变化的段沿用原来的 reader）
+        """
+        if self._searcher is None:
+            self._searcher = self.index.searcher()
+        elif not self._searcher.up_to_date():
+            self._searcher = self._searcher.refresh()
+        return self._searcher
+
+    def _close_searcher(self):
+        if self._searcher is not None:
+            self._searcher.close()
+            self._searcher = None
+
+    def _build_narrow_filter(self, narrow_queries):
+        """把 narrow_queries 解析成一个查询对象，作为 search 的 filter 参数"""
+        if not narrow_queries:
+            return None
+        parsed = [self.parser.parse(force_str(nq)) for nq in sorted(narrow_queries)]
+        if len(parsed) == 1:
+            return parsed[0]
+        return And(parsed)
+
+    def _result_cache_key(self, key, searcher):
+        reader = searcher.reader()
+        # 重建索引后代数可能从头开始，段ID是随机生成的，一起放进键里避免误命中
+        segments = tuple(r.segment().segment_id() for r, _ in reader.leaf_readers() if hasattr(r, "segment"))
+        return (self.path, reader.generation(), segments) + key
+
+    def _get_cached_results(self, key, searcher):
+        if not self.result_cache_size:
+            return None
+        key = self._result_cache_key(key, searcher)
+        with self._result_cache_lock:
+            cached = self._result_cache.get(key)
+            if cached is None:
+                return None
+            self._result_cache.move_to_end(key)
+        results = dict(cached)
+        # SearchResult 会缓存加载过的模型对象，返回副本，避免不同请求之间共享
+        results["results"] = [copy.copy(result) for result in cached["results"]]
+        for result in results["results"]:
+            result._object = None
+        return results
+
+    def _set_cached_results(self, key, searcher, results):
+        if not self.result_cache_size:
+            return
+        key = self._result_cache_key(key, searcher)
+        cached = dict(results)
+        cached["results"] = [copy.copy(result) for result in results["results"]]
+        with self._result_cache_lock:
+            self._result_cache[key] = cached
+            self._result_cache.move_to_end(key)
+            while len(self._result_cache) > self.result_cache_size:
+                self._result_cache.popitem(last=False)
+
+    @classmethod
+    def clear_result_cache(cls):
+        with cls._result_cache_lock:
+            cls._result_cache.clear()
+        with cls._snippet_cache_lock:
+            cls._snippet_cache.clear()
+
+    @classmethod
+    def highlight_stats(cls):
+        """进程启动以来的高亮次数、缓存命中和耗时"""
+        with cls._snippet_cache_lock:
+            stats = dict(cls._highlight_stats)
+            stats["cached_snippets"] = len(cls._snippet_cache)
+        stats["seconds"] = round(stats["seconds"], 3)
+        stats["avg_ms_per_page"] = round(stats["seconds"] * 1000 / stats["pages"], 3) if stats["pages"] else None
+        return stats
+
     def build_schema(self, fields):
         schema_fields = {
             ID: WHOOSH_ID(stored=True, unique=True),
@@ -220,6 +327,14 @@ class WhooshSearchBackend(BaseSearchBackend):
                 schema_fields[field_class.index_fieldname] = BOOLEAN(
                     stored=field_class.stored
                 )
+            elif field_class.field_type == "snippet":
+                # 高亮摘要字段：额外保存每个词的字符位置，高亮时按位置直接切片，不再重新分词
+                schema_fields[field_class.index_fieldname] = TEXT(
+                    stored=True,
+                    analyzer=field_class.analyzer or get_analyzer(),
+                    chars=True,
+                    field_boost=field_class.boost,
+                )
             elif field_class.field_type == "ngram":
                 schema_fields[field_class.index_fieldname] = NGRAM(
                     minsize=3,
@@ -238,7 +353,7 @@ class WhooshSearchBackend(BaseSearchBackend):
             else:
                 schema_fields[field_class.index_fieldname] = TEXT(
                     stored=True,
-                    analyzer=field_class.analyzer or ChineseAnalyzer(),
+                    analyzer=field_class.analyzer or get_analyzer(),
                     field_boost=field_class.boost,
                     sortable=True,
                 )
@@ -264,20 +379,8 @@ class WhooshSearchBackend(BaseSearchBackend):
         writer = AsyncWriter(self.index)
 
         for obj in iterable:
-            try:
-                doc = index.full_prepare(obj)
-            except SkipDocument:
-                self.log.debug("Indexing for object `%s` skipped", obj)
-            else:
-                # Really make sure it's unicode, because Whoosh won't have it any
-                # other way.
-                for key in doc:
-                    doc[key] = self._from_python(doc[key])
-
-                # Document boosts aren't supported in Whoosh 2.5.0+.
-                if "boost" in doc:
-                    del doc["boost"]
-
+            doc = self.prepare_document(index, obj)
+            if doc is not None:
                 try:
                     writer.update_document(**doc)
                 except Exception:
@@ -298,6 +401,74 @@ class WhooshSearchBackend(BaseSearchBackend):
             if writer.ident is not None:
                 writer.join()
 
+    def prepare_document(self, index, obj):
+        """把对象转换成写入 Whoosh 的文档字典；跳过的对象返回 None"""
+        try:
+            doc = index.full_prepare(obj)
+        except SkipDocument:
+            self.log.debug("Indexing for object `%s` skipped", obj)
+            return None
+
+        # Really make sure it's unicode, because Whoosh won't have it any
+        # other way.
+        for key in doc:
+            doc[key] = self._from_python(doc[key])
+
+        # Document boosts aren't supported in Whoosh 2.5.0+.
+        if "boost" in doc:
+            del doc["boost"]
+        return doc
+
+    def create_subindex(self, path):
+        """
+        在 path 目录下建一个与主索引相同 schema 的空索引，供并行重建时各进程单独写入。
+        只构建 schema，不打开或创建主索引（主索引由父进程在启动子进程前 setup），
+        多个子进程同时执行时不会争抢创建主索引。
+        """
+        from haystack import connections
+
+        if getattr(self, "schema", None) is None:
+            self.content_field_name, self.schema = self.build_schema(
+                connections[self.connection_alias].get_unified_index().all_searchfields()
+            )
+        os.makedirs(path, exist_ok=True)
+        return FileStorage(path).create_index(self.schema)
+
+    def merge_subindexes(self, paths, replace_model=None):
+        """
+        把并行重建写出的子索引合并进主索引。
+        指定 replace_model 时先删除该模型的旧文档，删除和合并在同一次提交中生效，
+        查询端不会看到索引被清空的中间状态。合并直接复制倒排表，不再重新分词。
+        """
+        if not self.setup_complete:
+            self.setup()
+
+        self.index = self.index.refresh()
+        # 队列消费进程可能正持有写锁，等待它提交而不是直接失败
+        writer = self.index.writer(timeout=120)
+        subindexes = []
+        try:
+            if replace_model is not None:
+                writer.delete_by_term(DJANGO_CT, get_model_ct(replace_model))
+            for path in paths:
+                subindex = FileStorage(path).open_index(schema=self.schema)
+                subindexes.append(subindex)
+                with subindex.reader() as reader:
+                    writer.add_reader(reader)
+        except Exception:
+            writer.cancel()
+            raise
+        writer.commit()
+        return sum(subindex.doc_count() for subindex in subindexes)
+
+    def subindex_object_ids(self, paths):
+        """并行重建写出的子索引中全部对象的主键（字符串），只读 django_id 的词典，不读取存储字段"""
+        ids = set()
+        for path in paths:
+            with FileStorage(path).open_index(schema=self.schema).reader() as reader:
+                ids.update(force_str(term) for term in reader.lexicon(DJANGO_ID))
+        return ids
+
     def remove(self, obj_or_string, commit=True):
         if not self.setup_complete:
             self.setup()
@@ -316,6 +487,35 @@ class WhooshSearchBackend(BaseSearchBackend):
                 whoosh_id,
             )
 
+    def remove_many(self, identifiers):
+        """
+        用一个写入器批量删除文档，只提交一次。
+        identifiers 为 get_identifier 格式的字符串（app_label.model_name.pk）。
+        """
+        if not self.setup_complete:
+            self.setup()
+
+        if not identifiers:
+            return
+
+        self.index = self.index.refresh()
+        writer = AsyncWriter(self.index)
+
+        try:
+            for whoosh_id in identifiers:
+                writer.delete_by_term(ID, whoosh_id)
+        except Exception:
+            writer.cancel()
+            if not self.silently_fail:
+                raise
+
+            self.log.exception("Failed to remove %d documents from Whoosh", len(identifiers))
+            return
+
+        writer.commit()
+        if writer.ident is not None:
+            writer.join()
+
     def clear(self, models=None, commit=True):
         if not self.setup_complete:
             self.setup()
@@ -352,6 +552,8 @@ class WhooshSearchBackend(BaseSearchBackend):
     def delete_index(self):
         # Per the Whoosh mailing list, if wiping out everything from the index,
         # it's much more efficient to simply delete the index files.
+        self._close_searcher()
+        self.clear_result_cache()
         if self.use_file_storage and os.path.exists(self.path):
             shutil.rmtree(self.path)
         elif not self.use_file_storage:
@@ -367,6 +569,48 @@ class WhooshSearchBackend(BaseSearchBackend):
         self.index = self.index.refresh()
         self.index.optimize()
 
+    def index_stats(self):
+        """索引的段数、文档数、已删除未回收的文档数和磁盘占用"""
+        if not self.setup_complete:
+            self.setup()
+
+        self.index = self.index.refresh()
+        with self.index.reader() as reader:
+            stats = {
+                "generation": reader.generation(),
+                "segments": len(list(reader.leaf_readers())),
+                "documents": reader.doc_count(),
+                "deleted_documents": reader.doc_count_all() - reader.doc_count(),
+            }
+        stats["size_bytes"] = sum(self.storage.file_length(name) for name in self.storage.list())
+        return stats
+
+    def merge_segments(self, optimize=False, timeout=600):
+        """
+        合并索引段。optimize=True 合并成一个段并回收已删除文档，否则只合并较小的段。
+        合并期间持有写锁，只会让其它写入者等待；查询端继续读取已提交的旧段，提交后再切换到新段。
+        """
+        if not self.setup_complete:
+            self.setup()
+
+        before = self.index_stats()
+        started = time.monotonic()
+        writer = self.index.writer(timeout=timeout)
+        if optimize:
+            writer.commit(optimize=True)
+        else:
+            writer.commit(mergetype=MERGE_SMALL)
+        seconds = time.monotonic() - started
+        after = self.index_stats()
+        return {
+            "optimized": optimize,
+            "segments_before": before["segments"],
+            "segments_after": after["segments"],
+            "size_before": before["size_bytes"],
+            "size_after": after["size_bytes"],
+            "seconds": round(seconds, 3),
+        }
+
     def calculate_page(self, start_offset=0, end_offset=None):
         # Prevent against Whoosh throwing an error. Requires an end_offset
         # greater than 0.
@@ -491,9 +735,6 @@ class WhooshSearchBackend(BaseSearchBackend):
                 "Whoosh does not handle query faceting.", Warning, stacklevel=2
             )
 
-        narrowed_results = None
-        self.index = self.index.refresh()
-
         if limit_to_registered_models is None:
             limit_to_registered_models = getattr(
                 settings, "HAYSTACK_LIMIT_TO_REGISTERED_MODELS", True
@@ -516,30 +757,14 @@ class WhooshSearchBackend(BaseSearchBackend):
                 " OR ".join(["%s:%s" % (DJANGO_CT, rm) for rm in model_choices])
             )
 
-        narrow_searcher = None
-
-        if narrow_queries is not None:
-            # Potentially expensive? I don't see another way to do it in Whoosh...
-            narrow_searcher = self.index.searcher()
+        searcher = self._get_searcher()
 
-            for nq in narrow_queries:
-                recent_narrowed_results = narrow_searcher.search(
-                    self.parser.parse(force_str(nq)), limit=None
-                )
-
-                if len(recent_narrowed_results) <= 0:
-                    return {"results": [], "hits": 0}
-
-                if narrowed_results is not None:
-                    narrowed_results.filter(recent_narrowed_results)
-                else:
-                    narrowed_results = recent_narrowed_results
-
-        self.index = self.index.refresh()
-
-        if self.index.doc_count():
-            searcher = self.index.searcher()
-            parsed_query = self.parser.parse(query_string)
+        if searcher.doc_count():
+            if query_string == "*":
+                # 匹配全部文档：中文分词器会把单独的 * 过滤掉，解析出来是空查询
+                parsed_query = Every()
+            else:
+                parsed_query = self.parser.parse(query_string)
 
             # In the event of an invalid/stopworded query, recover gracefully.
             if parsed_query is None:
@@ -547,6 +772,26 @@ class WhooshSearchBackend(BaseSearchBackend):
 
             page_num, page_length = self.calculate_page(start_offset, end_offset)
 
+            # 结果缓存：相同的解析后查询、分页、排序、过滤条件，且索引代数未变化时直接复用
+            cache_key = (
+                "search",
+                repr(parsed_query),
+                page_num,
+                page_length,
+                tuple(sort_by or ()),
+                reverse,
+                tuple(sorted(narrow_queries or ())),
+                tuple(facets or ()),
+                repr(sorted((date_facets or {}).items())),
+                # 不同的高亮参数生成的摘要不同，参数字典序列化后放进键里
+                json.dumps(highlight, sort_keys=True, default=str) if isinstance(highlight, dict) else bool(highlight),
+                spelling_query,
+                result_class,
+            )
+            cached = self._get_cached_results(cache_key, searcher)
+            if cached is not None:
+                return cached
+
             search_kwargs = {
                 "pagelen": page_length,
                 "sortedby": sort_by,
@@ -555,8 +800,10 @@ class WhooshSearchBackend(BaseSearchBackend):
             }
 
             # Handle the case where the results have been narrowed.
-            if narrowed_results is not None:
-                search_kwargs["filter"] = narrowed_results
+            # 过滤条件作为查询对象交给同一个 searcher，不再用第二个 searcher 做 limit=None 的全量检索
+            narrow_filter = self._build_narrow_filter(narrow_queries)
+            if narrow_filter is not None:
+                search_kwargs["filter"] = narrow_filter
 
             try:
                 raw_page = searcher.search_page(parsed_query, page_num, **search_kwargs)
@@ -579,10 +826,7 @@ class WhooshSearchBackend(BaseSearchBackend):
                 result_class=result_class,
                 facet_types=facet_types,
             )
-            searcher.close()
-
-            if hasattr(narrow_searcher, "close"):
-                narrow_searcher.close()
+            self._set_cached_results(cache_key, searcher, results)
 
             return results
         else:
@@ -618,8 +862,6 @@ class WhooshSearchBackend(BaseSearchBackend):
 
         field_name = self.content_field_name
         narrow_queries = set()
-        narrowed_results = None
-        self.index = self.index.refresh()
 
         if limit_to_registered_models is None:
             limit_to_registered_models = getattr(
@@ -646,43 +888,36 @@ class WhooshSearchBackend(BaseSearchBackend):
         if additional_query_string and additional_query_string != "*":
             narrow_queries.add(additional_query_string)
 
-        narrow_searcher = None
-
-        if narrow_queries is not None:
-            # Potentially expensive? I don't see another way to do it in Whoosh...
-            narrow_searcher = self.index.searcher()
-
-            for nq in narrow_queries:
-                recent_narrowed_results = narrow_searcher.search(
-                    self.parser.parse(force_str(nq)), limit=None
-                )
-
-                if len(recent_narrowed_results) <= 0:
-                    return {"results": [], "hits": 0}
-
-                if narrowed_results:
-                    narrowed_results.filter(recent_narrowed_results)
-                else:
-                    narrowed_results = recent_narrowed_results
-
         page_num, page_length = self.calculate_page(start_offset, end_offset)
 
-        self.index = self.index.refresh()
+        searcher = self._get_searcher()
+        cache_key = (
+            "more_like_this",
+            get_identifier(model_instance),
+            page_num,
+            page_length,
+            end_offset,
+            tuple(sorted(narrow_queries)),
+            result_class,
+        )
+        cached = self._get_cached_results(cache_key, searcher)
+        if cached is not None:
+            return cached
+
         raw_results = EmptyResults()
 
-        searcher = None
-        if self.index.doc_count():
+        if searcher.doc_count():
             query = "%s:%s" % (ID, get_identifier(model_instance))
-            searcher = self.index.searcher()
             parsed_query = self.parser.parse(query)
-            results = searcher.search(parsed_query)
+            results = searcher.search(parsed_query, limit=1)
 
             if len(results):
-                raw_results = results[0].more_like_this(field_name, top=end_offset)
-
-            # Handle the case where the results have been narrowed.
-            if narrowed_results is not None and hasattr(raw_results, "filter"):
-                raw_results.filter(narrowed_results)
+                # 过滤条件直接作为 filter 传入，由 Whoosh 在打分时跳过不匹配的文档
+                raw_results = results[0].more_like_this(
+                    field_name,
+                    top=end_offset,
+                    filter=self._build_narrow_filter(narrow_queries),
+                )
 
         try:
             raw_page = ResultsPage(raw_results, page_num, page_length)
@@ -698,12 +933,7 @@ class WhooshSearchBackend(BaseSearchBackend):
             return {"results": [], "hits": 0, "spelling_suggestion": None}
 
         results = self._process_results(raw_page, result_class=result_class)
-
-        if searcher:
-            searcher.close()
-
-        if hasattr(narrow_searcher, "close"):
-            narrow_searcher.close()
+        self._set_cached_results(cache_key, searcher, results)
 
         return results
 
@@ -761,6 +991,18 @@ class WhooshSearchBackend(BaseSearchBackend):
                                 lst.insert(i, none_entry)
                                 break
 
+        snippets = {}
+        highlight_ms = None
+        if highlight:
+            started = time.perf_counter()
+            snippets = self._highlight_page(raw_page, query_string)
+            elapsed = time.perf_counter() - started
+            highlight_ms = round(elapsed * 1000, 3)
+            with self._snippet_cache_lock:
+                self._highlight_stats["seconds"] += elapsed
+            if elapsed > 0.1:
+                self.log.warning("高亮摘要耗时 %.1f 毫秒（%d 条结果）", elapsed * 1000, len(snippets))
+
         for doc_offset, raw_result in enumerate(raw_page):
             score = raw_page.score(doc_offset) or 0
             app_label, model_name = raw_result[DJANGO_CT].split(".")
@@ -792,19 +1034,8 @@ class WhooshSearchBackend(BaseSearchBackend):
                 del additional_fields[DJANGO_ID]
 
                 if highlight:
-                    sa = ChineseAnalyzer()
-                    formatter = WhooshHtmlFormatter("em")
-                    terms = [token.text for token in sa(query_string)]
-
-                    whoosh_result = whoosh_highlight(
-                        additional_fields.get(self.content_field_name),
-                        terms,
-                        sa,
-                        ContextFragmenter(),
-                        formatter,
-                    )
                     additional_fields["highlighted"] = {
-                        self.content_field_name: [whoosh_result]
+                        self.content_field_name: [snippets.get(raw_result.docnum, "")]
                     }
 
                 result = result_class(
@@ -829,11 +1060,136 @@ class WhooshSearchBackend(BaseSearchBackend):
             "hits": hits,
             "facets": facets,
             "spelling_suggestion": spelling_suggestion,
+            "highlight_ms": highlight_ms,
         }
 
+    def _highlight_terms(self, query_string):
+        """查询中实际参与匹配的词（已分词），用于在摘要中标出"""
+        try:
+            parsed = self.parser.parse(query_string)
+            terms = {
+                text for fieldname, text in parsed.iter_all_terms()
+                if fieldname not in (ID, DJANGO_CT, DJANGO_ID) and isinstance(text, str)
+            }
+        except Exception:
+            terms = {token.text for token in get_analyzer()(query_string)}
+        return tuple(sorted(term for term in terms if term))
+
+    def _highlight_page(self, raw_page, query_string):
+        """
+        为一页结果生成高亮摘要，返回 {docnum: html}。
+        有 snippet 字段且保存了字符位置的文档，直接从倒排表读出查询词在摘要中的位置生成片段；
+        其它文档退回到对前 HIGHLIGHT_MAX_CHARS 个字符重新分词。每条结果最多 HIGHLIGHT_TOP_FRAGMENTS 个片段。
+        """
+        terms = self._highlight_terms(query_string)
+        formatter = WhooshHtmlFormatter("em")
+        searcher = raw_page.results.searcher
+        snippet_field = searcher.schema[SNIPPET_FIELD] if SNIPPET_FIELD in searcher.schema else None
+        pinpoint = snippet_field is not None and snippet_field.supports("characters")
+
+        snippets, texts, pending = {}, {}, []
+        cache_hits = 0
+        for hit in raw_page:
+            text = hit.get(SNIPPET_FIELD) if pinpoint else None
+            if text is None:
+                text = (hit.get(self.content_field_name) or "")[:HIGHLIGHT_MAX_CHARS]
+                source = self.content_field_name
+            else:
+                source = SNIPPET_FIELD
+            key = (self.path, hit[ID], source, hash(text), terms)
+            cached = self._get_cached_snippet(key)
+            if cached is not None:
+                snippets[hit.docnum] = cached
+                cache_hits += 1
+                continue
+            texts[hit.docnum] = (key, source, text)
+            pending.append(hit.docnum)
+
+        positions = self._snippet_positions(searcher, snippet_field, terms, [
+            docnum for docnum in pending if texts[docnum][1] == SNIPPET_FIELD
+        ]) if pinpoint else {}
+        for docnum in pending:
+            key, source, text = texts[docnum]
+            if not text or not terms:
+                # 页面用 |safe 输出，没有查询词时同样要转义
+                snippet = formatter._text(text[:HIGHLIGHT_FRAGMENT_CHARS])
+            elif source == SNIPPET_FIELD:
+                fragmenter = PinpointFragmenter(maxchars=HIGHLIGHT_FRAGMENT_CHARS, surround=30)
+                fragments = fragmenter.fragment_matches(text, positions.get(docnum, []))
+                fragments = top_fragments(fragments, HIGHLIGHT_TOP_FRAGMENTS, BasicFragmentScorer(), FIRST)
+                snippet = formatter(text, fragments) if fragments else formatter._text(text[:HIGHLIGHT_FRAGMENT_CHARS])
+            else:
+                snippet = whoosh_highlight(
+                    text, terms, get_analyzer(),
+                    ContextFragmenter(maxchars=HIGHLIGHT_FRAGMENT_CHARS, surround=30),
+                    formatter, top=HIGHLIGHT_TOP_FRAGMENTS,
+                )
+            snippets[docnum] = snippet
+            self._set_cached_snippet(key, snippet)
+
+        with self._snippet_cache_lock:
+            stats = self._highlight_stats
+            stats["pages"] += 1
+            stats["hits"] += len(snippets)
+            stats["cache_hits"] += cache_hits
+        return snippets
+
+    @staticmethod
+    def _snippet_positions(searcher, field, terms, docnums):
+        """从倒排表读出查询词在这些文档摘要中的字符位置，返回 {docnum: [Token, ...]}（按起始位置排序）"""
+        positions = {docnum: [] for docnum in docnums}
+        if not docnums:
+            return positions
+        docnums = sorted(docnums)
+        reader = searcher.reader()
+        for term in terms:
+            btext = field.to_bytes(term)
+            if (SNIPPET_FIELD, btext) not in reader:
+                continue
+            matcher = searcher.postings(SNIPPET_FIELD, btext)
+            for docnum in docnums:
+                if not matcher.is_active():
+                    break
+                if matcher.id() < docnum:
+                    matcher.skip_to(docnum)
+                    if not matcher.is_active():
+                        break
+                if matcher.id() == docnum:
+                    positions[docnum].extend(
+                        Token(text=term, pos=pos, startchar=startchar, endchar=endchar, matched=True)
+                        for pos, startchar, endchar in matcher.value_as("characters")
+                    )
+        for docnum, tokens in positions.items():
+            # 搜索模式分词会产生重叠的词，同一起点只保留最长的那个，重叠部分交给格式化时跳过
+            tokens.sort(key=lambda t: (t.startchar, -t.endchar))
+            deduped = []
+            for token in tokens:
+                if not deduped or token.startchar != deduped[-1].startchar:
+                    deduped.append(token)
+            positions[docnum] = deduped
+        return positions
+
+    def _get_cached_snippet(self, key):
+        if not self.snippet_cache_size:
+            return None
+        with self._snippet_cache_lock:
+            snippet = self._snippet_cache.get(key)
+            if snippet is not None:
+                self._snippet_cache.move_to_end(key)
+            return snippet
+
+    def _set_cached_snippet(self, key, snippet):
+        if not self.snippet_cache_size:
+            return
+        with self._snippet_cache_lock:
+            self._snippet_cache[key] = snippet
+            self._snippet_cache.move_to_end(key)
+            while len(self._snippet_cache) > self.snippet_cache_size:
+                self._snippet_cache.popitem(last=False)
+
     def create_spelling_suggestion(self, query_string):
         spelling_suggestion = None
-        reader = self.index.reader()
+        reader = self._get_searcher().reader()
         corrector = reader.corrector(self.content_field_name)
         cleaned_query = force_str(query_string)
 